@@ -0,0 +1,135 @@
+import random
+import subprocess
+import tracemalloc
+from datetime import date, datetime, timedelta
+from itertools import islice
+from statistics import median
+from time import perf_counter
+
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+
+from testapp.models import Author, Book, BookSold, DailyBookSales, WeeklyBookSales
+from testapp.notifiers import BestsellerNotifierVersion1, \
+    BestsellerNotifierVersion2, \
+    BestsellerNotifierVersion3, \
+    BestsellerNotifierVersion4
+from testapp.repository import BookRepository
+
+
+# Renders every notification like the real client would, but never sends anything.
+class BenchmarkDwilioClient(object):
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_notification(self, notification):
+        notification.to_number()
+        notification.message()
+        self.sent += 1
+
+    def send_notifications(self, notifications):
+        for notification in notifications:
+            self.send_notification(notification)
+
+
+# Bulk inserts straight into BookSold and builds the daily rollup and leaderboard from it afterwards, which is
+# much quicker than keeping them current as the sales go in.
+def seed(books, sales, days=60, seed=0):
+    rng = random.Random(seed)
+    authors = Author.objects.bulk_create(
+        [Author(name=f'Author {i}', phone_number=f'+1306{i:07}') for i in range(books)], batch_size=5000
+    )
+    book_ids = [book.pk for book in Book.objects.bulk_create(
+        [Book(title=f'Book {i}', author=author) for i, author in enumerate(authors)], batch_size=5000
+    )]
+    today = date.today()
+    sold = (BookSold(book_id=rng.choice(book_ids), price=rng.randint(5, 40),
+                     date=today - timedelta(days=rng.randrange(days))) for _ in range(sales))
+    while True:
+        chunk = list(islice(sold, 10000))
+        if not chunk:
+            break
+        BookSold.objects.bulk_create(chunk)
+    totals = BookSold.objects.values('book_id', 'date').annotate(total_sales=Sum('price'), total_sold=Count('id'))
+    DailyBookSales.objects.bulk_create((DailyBookSales(**row) for row in totals.iterator()), batch_size=5000)
+    WeeklyBookSales.objects.rebuild(today)
+
+
+def _list(iterable):
+    return len(list(iterable))
+
+
+# The notifiers all send through dwilio_client, a BenchmarkDwilioClient by default.
+def targets(dwilio_client=None):
+    dwilio_client = dwilio_client or BenchmarkDwilioClient()
+    last_week = datetime.now() - timedelta(days=7)
+    return {
+        'BestSellerManager.bestsellers': lambda: _list(Book.objects.bestsellers(since=last_week)),
+        'BestSellerManager.leaderboard': lambda: _list(Book.objects.leaderboard()),
+        'BookRepository.best_sellers_last_week': lambda: _list(BookRepository().best_sellers_last_week()),
+        'BookRepository.best_sellers_last_week(stream)':
+            lambda: _list(BookRepository(stream=True).best_sellers_last_week()),
+        'BestsellerNotifierVersion1': lambda: BestsellerNotifierVersion1(dwilio_client=dwilio_client).\
+            notify_current_best_sellers(),
+        'BestsellerNotifierVersion2': lambda: BestsellerNotifierVersion2(dwilio_client=dwilio_client).\
+            notify_current_best_sellers(),
+        'BestsellerNotifierVersion3': lambda: BestsellerNotifierVersion3(dwilio_client=dwilio_client).\
+            notify_current_best_sellers(),
+        'BestsellerNotifierVersion4(books)': lambda: BestsellerNotifierVersion4(
+            dwilio_client=dwilio_client, rows=False
+        ).notify_current_best_sellers(),
+        'BestsellerNotifierVersion4': lambda: BestsellerNotifierVersion4(dwilio_client=dwilio_client).\
+            notify_current_best_sellers(),
+    }
+
+
+# Wall time (min and median of repeat runs), query count and time, and peak Python memory of one target.
+def measure(fn, repeat=3):
+    walls = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        walls.append(perf_counter() - start)
+    reset_queries()  # the log is capped, and seeding may have filled it
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        'wall_seconds_min': min(walls),
+        'wall_seconds_median': median(walls),
+        'queries': len(queries),
+        'query_seconds': sum(float(query['time']) for query in queries.captured_queries),
+        'peak_memory_bytes': peak,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Seeds books and sales, measures every target against them, then rolls the lot back. Returns a JSON-able report.
+def run(books=1000, sales=100000, days=60, repeat=3, only=None):
+    report = {
+        'commit': _commit(),
+        'vendor': connection.vendor,
+        'scale': {'books': books, 'sales': sales, 'days': days},
+        'results': {},
+    }
+    with transaction.atomic():
+        start = perf_counter()
+        seed(books, sales, days)
+        report['seed_seconds'] = perf_counter() - start
+        for name, fn in targets().items():
+            if only is None or name in only:
+                report['results'][name] = measure(fn, repeat)
+        transaction.set_rollback(True)
+    return report
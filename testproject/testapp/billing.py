@@ -1,4 +1,9 @@
+from collections import OrderedDict
+from concurrent.futures import Future
 from dataclasses import dataclass
+from threading import Lock, Thread, Timer
+
+from testapp import instrumentation
 
 
 class BillingSystemException(Exception):
@@ -13,27 +18,121 @@ class AccountDebit:
 
 class BillingSystem(object):
 
-    def charge_for_usage(self, debit: AccountDebit):
-
-        # this would talk to a real billing system.
-        def _call_billing_api(url, post_body):
-            # return {
-            #     'status_code': 200,
-            #     'response': { 'success': True, 'new_balance': 50}
-            # }
+    # Without a transport nothing is ever charged, pass default_transport() (or another) to talk to a real billing
+    # system. Charges carry no idempotency key, so the transport won't retry one that may have reached the server.
+    def __init__(self, transport=None, base_url='http://example.com'):
+        self.transport = transport
+        self.base_url = base_url
+
+    def _call_billing_api(self, url, post_body):
+        # return {
+        #     'status_code': 200,
+        #     'response': { 'success': True, 'new_balance': 50}
+        # }
+        if self.transport is None:
             raise Exception('No billing allowed during tests')
+        return self.transport.post_json(url, post_body)
 
+    def charge_for_usage(self, debit: AccountDebit):
         post_body = {
             'account_id': debit.account_id,
             'amount': debit.amount
         }
 
-        return _call_billing_api('http://example.com/billing', post_body)
-
-
-
-
-
+        with instrumentation.timer('billing_charge_seconds'):
+            return self._call_billing_api(f'{self.base_url}/billing', post_body)
 
+    # One request for many debits. Returns one result per debit, in order, shaped like charge_for_usage's.
+    def charge_for_usage_batch(self, debits):
+        post_body = {
+            'debits': [{'account_id': debit.account_id, 'amount': debit.amount} for debit in debits]
+        }
 
+        # return {
+        #     'status_code': 200,
+        #     'response': {'results': [{'success': True, 'new_balance': 50}, ...]}
+        # }
+        with instrumentation.timer('billing_charge_batch_seconds'):
+            result = self._call_billing_api(f'{self.base_url}/billing/batch', post_body)
+        if result['status_code'] != 200:
+            return [result] * len(debits)
+        return [{'status_code': 200, 'response': response} for response in result['response']['results']]
+
+
+# Drop-in for BillingSystem. Debits arriving within window seconds of each other are merged per account and
+# settled with one charge_for_usage_batch call. Each caller blocks until then and gets its own new balance,
+# as if its debit had been applied on its own in arrival order. Callers give up waiting after timeout seconds
+# with concurrent.futures.TimeoutError, though the batch may still be charged.
+class AggregatingBillingSystem(object):
+
+    def __init__(self, billing_system=None, window=0.05, max_batch_size=500, timeout=30):
+        self.billing_system = billing_system or BillingSystem()
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._pending = []
+        self._timer = None
+        self._lock = Lock()
 
+    def charge_for_usage(self, debit: AccountDebit):
+        future = Future()
+        with self._lock:
+            self._pending.append((debit, future))
+            if len(self._pending) >= self.max_batch_size:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future.result(timeout=self.timeout)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            # settle outside the lock, so new debits can queue up for the next window meanwhile.
+            Thread(target=self._settle, args=(pending,), daemon=True).start()
+
+    def _settle(self, pending):
+        # whatever goes wrong, no caller is left waiting on a future nobody will resolve.
+        try:
+            self._settle_batch(pending)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _settle_batch(self, pending):
+        by_account = OrderedDict()
+        for debit, future in pending:
+            by_account.setdefault(debit.account_id, []).append((debit, future))
+        merged = [AccountDebit(account_id, sum(debit.amount for debit, _ in debits))
+                  for account_id, debits in by_account.items()]
+        results = self.billing_system.charge_for_usage_batch(merged)
+        if len(results) != len(merged):
+            raise BillingSystemException(f'Billing API returned {len(results)} results for {len(merged)} debits')
+
+        for debits, result in zip(by_account.values(), results):
+            if result['status_code'] != 200:
+                for _, future in debits:
+                    future.set_result(result)
+                continue
+            if 'new_balance' not in result['response']:
+                exception = BillingSystemException(f'Billing API returned no new balance: {result["response"]}')
+                for _, future in debits:
+                    future.set_exception(exception)
+                continue
+            # work back from the final balance to the balance right after each caller's debit.
+            balance = result['response']['new_balance']
+            for debit, future in reversed(debits):
+                future.set_result({
+                    'status_code': 200,
+                    'response': dict(result['response'], new_balance=balance),
+                })
+                balance += debit.amount
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+from testapp.slow_formatter import SlowStringFormatter
+
+_MISSING = object()
+
+
+# In-process LRU, bounded by max_entries, with an optional ttl (seconds).
+class LocalFormatterCache(object):
+
+    def __init__(self, max_entries=1024, ttl=None, clock=monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._entries.get(key, (_MISSING, None))
+            if value is not _MISSING and expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                self.evictions += 1
+                value = _MISSING
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            expires_at = self.clock() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+# Backed by one of Django's CACHES, so results are shared between processes. Size limits and evictions are the
+# cache backend's business, so evictions is always 0 here.
+class DjangoFormatterCache(object):
+
+    def __init__(self, alias='default', ttl=None, key_prefix='slow_string_format'):
+        self.alias = alias
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    # keys are hashed, arbitrary strings aren't safe memcached keys.
+    def _cache_key(self, key):
+        return f'{self.key_prefix}:{sha256(repr(key).encode()).hexdigest()}'
+
+    def get(self, key):
+        value = self._cache.get(self._cache_key(key), _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._cache.set(self._cache_key(key), value, self.ttl)
+
+
+# really_slow_string_format is a pure function of its two strings, so its results can be memoized.
+# Opt-in, pass one as the formatter to PayPerUseStringFormatter.
+class CachingStringFormatter(object):
+
+    def __init__(self, formatter=None, cache=None):
+        self.formatter = formatter or SlowStringFormatter()
+        self.cache = cache or LocalFormatterCache()
+
+    def really_slow_string_format(self, string1, string2):
+        key = (string1, string2)
+        value = self.cache.get(key)
+        if value is _MISSING:
+            value = self.formatter.really_slow_string_format(string1, string2)
+            self.cache.set(key, value)
+        return value
+
+    def stats(self):
+        return {'hits': self.cache.hits, 'misses': self.cache.misses, 'evictions': self.cache.evictions}
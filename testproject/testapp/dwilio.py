@@ -1,20 +1,203 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from itertools import islice
+from typing import Optional
+from random import random
+from threading import Lock
+from time import monotonic, sleep
+from uuid import uuid4
 
+from testapp import instrumentation
+from testapp.throttling import AIMDConcurrencyLimit
+from testapp.transport import default_transport, retry_after
+
+
+class DwilioApiException(Exception):
+    pass
+
+
+_MESSAGE = 'Congratulations {}, your book {} sold {} ${} this week'.format
+
+
+# Either wraps a book (anything with title, author, total_sold and total_sales), or is built with from_row straight
+# from a query row, in which case no model instances are involved at all. Slots keep the thousands of these in a run
+# small, and the message is rendered at most once however often retries and logging ask for it.
 class BestSellerNotification(object):
 
+    # The columns from_row expects, in order.
+    FIELDS = ('pk', 'title', 'author__name', 'author__phone_number', 'total_sold', 'total_sales')
+
+    __slots__ = ('book', 'book_id', 'title', 'author_name', 'phone_number', 'total_sold', 'total_sales', '_message')
+
     def __init__(self, book):
         self.book = book
+        self.book_id = getattr(book, 'pk', None)
+        self._message = None
+
+    @classmethod
+    def from_row(cls, row):
+        notification = cls.__new__(cls)
+        notification.book = None
+        notification.book_id, notification.title, notification.author_name, notification.phone_number, \
+            notification.total_sold, notification.total_sales = row
+        notification._message = None
+        return notification
 
     def message(self):
-        return f'Congratulations {self.book.author.name}, your book {self.book.title} sold {self.book.total_sold} ${self.book.total_sales} this week'
+        if self._message is None:
+            book = self.book
+            if book is None:
+                self._message = _MESSAGE(self.author_name, self.title, self.total_sold, self.total_sales)
+            else:
+                self._message = _MESSAGE(book.author.name, book.title, book.total_sold, book.total_sales)
+        return self._message
 
     def to_number(self):
+        if self.book is None:
+            return self.phone_number
         return self.book.author.phone_number
 
 
+@dataclass(frozen=True)
+class NotificationResult:
+    notification: BestSellerNotification
+    success: bool
+    error: Optional[Exception] = None
+
+
+# rate_limiter (a TokenBucket, in messages a second) keeps sends under the provider's quota. Requests also go
+# through concurrency_limit, which by default adapts between 1 and max_in_flight: throttled (429) and server error
+# (5xx) responses, failed requests and slow ones shrink it, successes grow it back, so it settles near what the
+# provider will take. Throttled requests are retried up to throttle_retries times, after a jittered backoff or
+# whatever their Retry-After asked for, if longer.
 class DwilioClient(object):
 
-    def _send_to_api(self):
-        pass
+    def __init__(self, transport=None, base_url='https://api.dwilio.example', batch_size=100, max_in_flight=8,
+                 rate_limiter=None, concurrency_limit=None, throttle_retries=3, throttle_backoff=0.1, sleep=sleep):
+        self.transport = transport or default_transport()
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = rate_limiter
+        self.concurrency_limit = concurrency_limit or AIMDConcurrencyLimit(max_in_flight, maximum=max_in_flight)
+        self.throttle_retries = throttle_retries
+        self.throttle_backoff = throttle_backoff
+        self.sleep = sleep
+
+    # messages is how many rate limiter tokens the request costs. Every attempt carries the same idempotency key, so
+    # the transport may retry it and Dwilio sends the messages once however many times the request arrives.
+    def _post(self, path, post_body, messages=1):
+        idempotency_key = str(uuid4())
+        for attempt in range(self.throttle_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(messages)
+            self.concurrency_limit.acquire()
+            # a request that fails outright, or with a server error, counts as congestion too, it may well be overload.
+            congested, started = True, monotonic()
+            try:
+                result = self.transport.post_json(
+                    f'{self.base_url}{path}', post_body, idempotency_key=idempotency_key
+                )
+                congested = result['status_code'] == 429 or result['status_code'] >= 500
+            finally:
+                self.concurrency_limit.release(congested, monotonic() - started)
+            if result['status_code'] != 429:
+                break
+            instrumentation.increment('dwilio_throttled')
+            if attempt < self.throttle_retries:
+                backoff = random() * self.throttle_backoff * 2 ** attempt
+                self.sleep(max(backoff, retry_after(result.get('headers')) or 0))
+        if result['status_code'] >= 300:
+            raise DwilioApiException(result['status_code'])
+        return result
+
+    def _send_to_api(self, to_number, message):
+        return self._post('/messages', {'to': to_number, 'body': message})
+
+    # one request to the bulk endpoint, payloads are (to_number, message) pairs.
+    def _send_batch_to_api(self, payloads):
+        with instrumentation.timer('dwilio_batch_send_seconds'):
+            return self._post('/messages/batch', {'messages': [{'to': to, 'body': body} for to, body in payloads]},
+                          messages=len(payloads))
 
     def send_notification(self, notification):
-        self._send_to_api(notification.to_number, notification.message)
+        with instrumentation.timer('dwilio_send_seconds'):
+            self._send_to_api(notification.to_number(), notification.message())
+
+    # Sends in batches of batch_size with at most max_in_flight batch requests outstanding. The iterable is consumed
+    # lazily, so sending can start before a (streamed) query has finished, and only max_in_flight batches of
+    # notifications are waiting to be sent at any time. The returned results do grow with the run though: one
+    # NotificationResult per notification, in the order they were given, each holding on to its notification.
+    # on_batch, if given, is called with each batch's results as soon as it completes (on the calling thread), e.g.
+    # to checkpoint progress.
+    def send_notifications(self, notifications, on_batch=None):
+        notifications = iter(notifications)
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = {}
+            while True:
+                while len(pending) < self.max_in_flight:
+                    batch = list(islice(notifications, self.batch_size))
+                    if not batch:
+                        break
+                    payloads = [(notification.to_number(), notification.message()) for notification in batch]
+                    future = executor.submit(self._send_batch_to_api, payloads)
+                    pending[future] = (len(results), batch)
+                    results.extend([None] * len(batch))
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    offset, batch = pending.pop(future)
+                    error = future.exception()
+                    for i, notification in enumerate(batch):
+                        results[offset + i] = NotificationResult(notification, error is None, error)
+                    instrumentation.increment('dwilio_notifications', len(batch),
+                                              outcome='sent' if error is None else 'failed')
+                    if on_batch is not None:
+                        on_batch(results[offset:offset + len(batch)])
+        return results
+
+
+# asyncio flavour of DwilioClient. There's no async HTTP client among the project's dependencies, so requests go
+# through a DwilioClient (the pooled keep-alive transport, its retries, the rate limiter and the adaptive concurrency
+# limit, shared with anything else using the same objects) on a pool of max_in_flight threads. The event loop never
+# blocks on them, but only max_in_flight sends are actually in progress at a time, any more wait for a free thread.
+# The threads outlive each send, so build one client and share it (default_async_client()) rather than one per run,
+# and close() any other when done with it.
+class AsyncDwilioClient(object):
+
+    def __init__(self, base_url='https://api.dwilio.example', transport=None, rate_limiter=None, max_in_flight=10,
+                 dwilio_client=None):
+        self.dwilio_client = dwilio_client or DwilioClient(
+            transport, base_url, max_in_flight=max_in_flight, rate_limiter=rate_limiter
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.dwilio_client.max_in_flight)
+
+    @property
+    def max_in_flight(self):
+        return self.dwilio_client.max_in_flight
+
+    async def _send_to_api(self, to_number, message):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.dwilio_client._send_to_api, to_number, message)
+
+    async def send_notification(self, notification):
+        return await self._send_to_api(notification.to_number(), notification.message())
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_default_async_client = None
+_default_async_client_lock = Lock()
+
+
+# Notifiers built without an async client share this one, and so share its threads.
+def default_async_client():
+    global _default_async_client
+    with _default_async_client_lock:
+        if _default_async_client is None:
+            _default_async_client = AsyncDwilioClient()
+        return _default_async_client
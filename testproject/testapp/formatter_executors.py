@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from threading import BoundedSemaphore
+
+
+# Executors to hand PayPerUseStringFormatter (or call directly) for running SlowStringFormatter work.
+# All of them return concurrent.futures.Future results.
+
+
+# Runs the work in the caller's thread, the future is already done when submit returns.
+class InlineFormatterExecutor(object):
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def warm_up(self):
+        pass
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def _warm_up_worker():
+    pass
+
+
+# Wraps a thread or process pool with a bounded queue. At most max_workers + max_queued submissions are
+# outstanding, past that submit blocks until one finishes, so a burst can't pile up unbounded work (or memory).
+class PoolFormatterExecutor(object):
+
+    def __init__(self, pool, max_workers, max_queued):
+        self.pool = pool
+        self.max_workers = max_workers
+        self._slots = BoundedSemaphore(max_workers + max_queued)
+
+    def submit(self, fn, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            future = self.pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    # Start the workers ahead of the first request, so it doesn't pay for spawning them.
+    def warm_up(self):
+        wait([self.submit(_warm_up_worker) for _ in range(self.max_workers)])
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+
+class ThreadFormatterExecutor(PoolFormatterExecutor):
+
+    def __init__(self, max_workers=4, max_queued=100):
+        super().__init__(ThreadPoolExecutor(max_workers=max_workers), max_workers, max_queued)
+
+
+# CPU bound formatting scales with cores instead of queueing on the GIL. The formatter and its arguments must be
+# picklable.
+class ProcessFormatterExecutor(PoolFormatterExecutor):
+
+    def __init__(self, max_workers=None, max_queued=100):
+        max_workers = max_workers or os.cpu_count() or 1
+        super().__init__(ProcessPoolExecutor(max_workers=max_workers), max_workers, max_queued)
@@ -0,0 +1,92 @@
+import csv
+import json
+from dataclasses import dataclass
+from datetime import date
+from io import StringIO
+from itertools import islice
+from time import monotonic
+
+from django.db import connection, transaction
+
+from testapp.models import BookSold, DailyBookSales, WeeklyBookSales
+
+
+@dataclass(frozen=True)
+class IngestReport:
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _parse_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+PARSERS = {
+    'csv': csv.DictReader,
+    'jsonl': _parse_jsonl,
+}
+
+
+# (book_id, price, sold_on) tuples from records with book_id, price and date (ISO format) fields.
+def _sales(records):
+    for number, record in enumerate(records, start=1):
+        try:
+            yield int(record['book_id']), int(record['price']), date.fromisoformat(record['date'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f'Bad sale record {number}: {record!r}') from e
+
+
+def _copy_sales(sales):
+    buffer = StringIO()
+    csv.writer(buffer).writerows((book_id, price, sold_on.isoformat()) for book_id, price, sold_on in sales)
+    buffer.seek(0)
+    table = connection.ops.quote_name(BookSold._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(BookSold._meta.get_field(name).column)
+                        for name in ('book', 'price', 'date'))
+    sql = f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)'
+    # psycopg 3 streams through cursor.copy(), psycopg2 through copy_expert().
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    with connection.cursor() as cursor:
+        if is_psycopg3:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+        else:
+            cursor.copy_expert(sql, buffer)
+
+
+def _create_sales(sales, chunk_size):
+    BookSold.objects.bulk_create(
+        [BookSold(book_id=book_id, price=price, date=sold_on) for book_id, price, sold_on in sales],
+        batch_size=chunk_size,
+    )
+
+
+# Streams sales in and writes them chunk_size at a time, with COPY on PostgreSQL (unless use_copy=False) and
+# bulk_create elsewhere. Neither calls BookSold.save, so the daily rollup and leaderboard are updated here, with one
+# upsert each per chunk. It's all one transaction, so a bad record part way through leaves nothing behind and the
+# fixed file can simply be ingested again.
+def ingest_sales(stream, file_format='csv', chunk_size=5000, use_copy=None):
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    sales = _sales(PARSERS[file_format](stream))
+    rows = 0
+    start = monotonic()
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(sales, chunk_size))
+            if not chunk:
+                break
+            if use_copy:
+                _copy_sales(chunk)
+            else:
+                _create_sales(chunk, chunk_size)
+            DailyBookSales.objects.record_sales(chunk)
+            WeeklyBookSales.objects.record_sales(chunk)
+            rows += len(chunk)
+    return IngestReport(rows, monotonic() - start)
@@ -0,0 +1,220 @@
+import logging
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+
+# Counters, histograms and timers (histograms of seconds) for the hot paths: billing, formatting, Dwilio sends and
+# repository queries. Nothing is recorded until a sink is added, and until then timer() hands back a shared no-op,
+# so instrumented code costs a function call and a truthiness check.
+#
+#   sink = PrometheusSink()
+#   add_sink(sink)
+#   ...
+#   sink.exposition()
+#
+# Sinks have one method, record(kind, name, value, labels), kind being 'counter' or 'histogram' and labels a sorted
+# tuple of (label, value) pairs.
+
+_sinks = ()
+_sinks_lock = Lock()
+
+
+def add_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (sink,)
+
+
+def remove_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+def _record(kind, name, value, labels):
+    labels = tuple(sorted(labels.items()))
+    for sink in _sinks:
+        sink.record(kind, name, value, labels)
+
+
+def increment(name, value=1, **labels):
+    if _sinks:
+        _record('counter', name, value, labels)
+
+
+def observe(name, value, **labels):
+    if _sinks:
+        _record('histogram', name, value, labels)
+
+
+class _Timer(object):
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record('histogram', self.name, perf_counter() - self.started, self.labels)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# with timer('billing_charge_seconds'): ... observes how long the block took, in seconds.
+def timer(name, **labels):
+    if _sinks:
+        return _Timer(name, labels)
+    return _NULL_TIMER
+
+
+# Times the time spent producing the items of iterable (a QuerySet, say, whose query only runs once it's iterated),
+# not the time the consumer spends on them, and counts the items into <name>_rows. Streamed results stay streamed.
+def timed_iteration(name, iterable, **labels):
+    if not _sinks:
+        return iterable
+    return _timed_iteration(name, iterable, labels)
+
+
+def _timed_iteration(name, iterable, labels):
+    seconds, rows = 0.0, 0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += perf_counter() - started
+            rows += 1
+            yield item
+    finally:
+        _record('histogram', f'{name}_seconds', seconds, labels)
+        _record('counter', f'{name}_rows', rows, labels)
+
+
+# timed_iteration for a QuerySet that stays a QuerySet: still lazy, chainable, and iterable with for, async for,
+# iterator() and aiterator(), it just times producing its results whichever way they're fetched. Apply it last, a
+# later values() or values_list() replaces what does the timing.
+def timed_queryset(name, queryset, **labels):
+    if not _sinks:
+        return queryset
+    iterable_class = queryset._iterable_class
+
+    class TimedIterable(iterable_class):
+        def __iter__(self):
+            return _timed_iteration(name, super().__iter__(), labels)
+
+    queryset = queryset.all()
+    queryset._iterable_class = TimedIterable
+    return queryset
+
+
+class LoggingSink(object):
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def record(self, kind, name, value, labels):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%s %s %s %s', kind, name, ','.join(f'{k}={v}' for k, v in labels), value)
+
+
+# Keeps everything, for tests. Use as a context manager to add and remove it around a block.
+class InMemorySink(object):
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = Lock()
+
+    def record(self, kind, name, value, labels):
+        with self._lock:
+            if kind == 'counter':
+                self.counters[name, labels] = self.counters.get((name, labels), 0) + value
+            else:
+                self.histograms.setdefault((name, labels), []).append(value)
+
+    def count(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def values(self, name, **labels):
+        return self.histograms.get((name, tuple(sorted(labels.items()))), [])
+
+    def __enter__(self):
+        add_sink(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_sink(self)
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+
+# Aggregates into counters and bucketed histograms, and renders them in the Prometheus text exposition format.
+class PrometheusSink(object):
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = Lock()
+
+    def record(self, kind, name, value, labels):
+        with self._lock:
+            if kind == 'counter':
+                self._counters[name, labels] = self._counters.get((name, labels), 0) + value
+                return
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[name, labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @staticmethod
+    def _labels(labels, **extra):
+        labels = labels + tuple(extra.items())
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+    def exposition(self):
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f'# TYPE {name}_total counter')
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f'{name}_total{self._labels(labels)} {value}')
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f'# TYPE {name} histogram')
+                for (histogram, labels), (counts, total, count) in sorted(self._histograms.items()):
+                    if histogram != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{self._labels(labels, le=bound)} {cumulative}')
+                    lines.append(f'{name}_sum{self._labels(labels)} {total}')
+                    lines.append(f'{name}_count{self._labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from testapp.models import WeeklyBookSales
+
+
+class Command(BaseCommand):
+    help = ('Slide the best seller leaderboard window forward to today, or rebuild it from the daily rollup. '
+            'Schedule it daily, just after midnight: reading the leaderboard doesn\'t advance it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute the leaderboard from scratch.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            WeeklyBookSales.objects.rebuild(date.today())
+        else:
+            WeeklyBookSales.objects.advance(date.today())
+        self.stdout.write(f'Leaderboard covers {WeeklyBookSales.objects.count()} books.')
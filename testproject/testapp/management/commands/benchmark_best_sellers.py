@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from testapp import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Seed sales at the given scale, time the best seller queries and notifiers, and write the results as '
+            'JSON. Everything seeded is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--sales', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=60, help='Spread sales over this many days.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--only', action='append', help='Only run the named target, may be repeated.')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+
+    def handle(self, *args, **options):
+        report = benchmarks.run(
+            books=options['books'],
+            sales=options['sales'],
+            days=options['days'],
+            repeat=options['repeat'],
+            only=options['only'],
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from testapp.ingestion import PARSERS
+from testapp.models import BookSold
+
+
+class Command(BaseCommand):
+    help = 'Bulk load BookSold rows from a point of sale export (CSV or JSON lines with book_id, price, date).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Export file, or - for stdin.')
+        parser.add_argument('--format', dest='file_format', choices=sorted(PARSERS), default='csv')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL.')
+
+    def handle(self, *args, **options):
+        use_copy = False if options['no_copy'] else None
+        if options['path'] == '-':
+            report = BookSold.objects.ingest(sys.stdin, options['file_format'], options['chunk_size'], use_copy)
+        else:
+            with open(options['path'], newline='') as stream:
+                report = BookSold.objects.ingest(stream, options['file_format'], options['chunk_size'], use_copy)
+        self.stdout.write(
+            f'Ingested {report.rows} sales in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/sec).'
+        )
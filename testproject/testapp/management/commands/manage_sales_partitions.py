@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from testapp.models import BookSold
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly BookSold partitions and detach old ones (PostgreSQL only). Run it daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--retain-months', type=int, default=24,
+                            help='Detach partitions for months older than this. 0 keeps everything.')
+
+    def handle(self, *args, **options):
+        created = BookSold.objects.create_partitions(months_ahead=options['months_ahead'])
+        detached = []
+        if options['retain_months']:
+            detached = BookSold.objects.detach_partitions(retain_months=options['retain_months'])
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        for name in detached:
+            self.stdout.write(f'Detached {name}')
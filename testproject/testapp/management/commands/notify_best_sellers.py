@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from testapp.models import NotificationRun
+from testapp.sharding import RunReport, notify_shard, notify_sharded, parse_shard
+
+
+class Command(BaseCommand):
+    help = 'Send this week\'s best seller notifications, optionally sharded by book_id across workers.'
+
+    def add_arguments(self, parser):
+        shards = parser.add_mutually_exclusive_group()
+        shards.add_argument('--shard', help='Send only shard i of N (as i/N), e.g. one per machine.')
+        shards.add_argument('--workers', type=int, help='Send all shards at once from a local pool of N processes.')
+        parser.add_argument('--resume', type=date.fromisoformat, metavar='WINDOW_START',
+                            help='Record sends in the run for the week starting WINDOW_START (YYYY-MM-DD) and skip '
+                                 'books it has already sent. Pass the same date to every restart and every shard. '
+                                 'With --shard the run is left unfinished: once every shard is done, run this again '
+                                 'with the same --resume and no --shard to send anything they missed and finish it.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        run = NotificationRun.objects.for_window(options['resume']) if options['resume'] else None
+        if options['workers'] is not None:
+            report = notify_sharded(options['workers'], run, options['chunk_size'])
+        else:
+            try:
+                index, count = parse_shard(options['shard'] or '0/1')
+            except ValueError as e:
+                raise CommandError(e)
+            shard = notify_shard(index, count, run and run.pk, options['chunk_size'])
+            if run is not None and count == 1 and not shard.failed:
+                run.finish()
+            report = RunReport((shard,))
+        for shard in report.shards:
+            self.stdout.write(f'Shard {shard.index}/{shard.count}: {shard.sent} sent, {shard.failed} failed '
+                              f'in {shard.seconds:.2f}s.')
+        self.stdout.write(f'Sent {report.sent} notifications ({report.failed} failed) in {report.seconds:.2f}s '
+                          f'({report.sent_per_second:.0f}/sec).')
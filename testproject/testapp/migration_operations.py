@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+# Building an index on a large sales table must not lock out writes, so use CREATE INDEX CONCURRENTLY on
+# PostgreSQL. Other backends (e.g. SQLite in local runs) fall back to a plain AddIndex. Migrations using it must set
+# atomic = False, CREATE INDEX CONCURRENTLY can't run inside a transaction.
+class AddIndexConcurrentlyOnPostgres(migrations.AddIndex):
+
+    def _operation(self, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            from django.contrib.postgres.operations import AddIndexConcurrently
+            return AddIndexConcurrently(self.model_name, self.index)
+        return migrations.AddIndex(self.model_name, self.index)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._operation(schema_editor).database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._operation(schema_editor).database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def backfill_daily_book_sales(apps, schema_editor):
+    BookSold = apps.get_model('testapp', 'BookSold')
+    DailyBookSales = apps.get_model('testapp', 'DailyBookSales')
+    rows = BookSold.objects.values('book_id', 'date').annotate(total_sales=Sum('price'), total_sold=Count('id'))
+    DailyBookSales.objects.bulk_create((DailyBookSales(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_sales', models.IntegerField(default=0)),
+                ('total_sold', models.IntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='testapp.book')),
+            ],
+            options={
+                'unique_together': {('book', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_book_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+from testapp.migration_operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('testapp', '0002_dailybooksales'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='booksold',
+            index=models.Index(fields=['date', 'book', 'price'], name='booksold_date_book_price_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0003_booksold_date_book_price_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardWindow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeeklyBookSales',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='weekly_sales', serialize=False, to='testapp.book')),
+                ('total_sales', models.IntegerField(default=0)),
+                ('total_sold', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_sales'], name='weeklybooksales_total_idx')],
+            },
+        ),
+    ]
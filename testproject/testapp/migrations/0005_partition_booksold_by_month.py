@@ -0,0 +1,75 @@
+from datetime import date
+
+from django.db import migrations
+
+from testapp import partitions
+
+
+# Rebuilds testapp_booksold as a table range partitioned by month on date, PostgreSQL only.
+# Partitioned tables need the partition key in their primary key, so it becomes (id, date); ids still come from a
+# single sequence. Existing rows are copied over in this migration's transaction, so schedule it accordingly on a
+# large table. Other backends are left alone.
+# Only the database changes: the migration state (and so the model) keeps id as the primary key, which is what the ORM
+# needs to look rows up, and the sequence keeps it unique on its own. That's why this is RunPython rather than a
+# schema operation, and why makemigrations never sees the (id, date) key.
+def partition_booksold(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = 'testapp_booksold' AND indexname <> 'testapp_booksold_pkey'"
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {schema_editor.quote_name(name)}')
+        cursor.execute('ALTER TABLE testapp_booksold RENAME TO testapp_booksold_unpartitioned')
+        cursor.execute(
+            'ALTER TABLE testapp_booksold_unpartitioned '
+            'RENAME CONSTRAINT testapp_booksold_pkey TO testapp_booksold_unpartitioned_pkey'
+        )
+        cursor.execute(
+            'CREATE TABLE testapp_booksold ('
+            '    id integer NOT NULL,'
+            '    price integer NOT NULL,'
+            '    date date NOT NULL,'
+            '    book_id integer NOT NULL REFERENCES testapp_book (id) DEFERRABLE INITIALLY DEFERRED,'
+            '    PRIMARY KEY (id, date)'
+            ') PARTITION BY RANGE (date)'
+        )
+        cursor.execute('CREATE SEQUENCE testapp_booksold_partitioned_id_seq OWNED BY testapp_booksold.id')
+        cursor.execute(
+            "SELECT setval('testapp_booksold_partitioned_id_seq', COALESCE(MAX(id), 0) + 1, false) "
+            "FROM testapp_booksold_unpartitioned"
+        )
+        cursor.execute(
+            "ALTER TABLE testapp_booksold ALTER COLUMN id SET DEFAULT nextval('testapp_booksold_partitioned_id_seq')"
+        )
+        cursor.execute(f'CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF testapp_booksold DEFAULT')
+
+        cursor.execute('SELECT MIN(date) FROM testapp_booksold_unpartitioned')
+        today = date.today()
+        first_sale = cursor.fetchone()[0] or today
+        partitions.create_partitions(first_sale, partitions.add_months(today.replace(day=1), 3),
+                                     using=schema_editor.connection.alias)
+
+        cursor.execute(
+            'INSERT INTO testapp_booksold (id, price, date, book_id) '
+            'SELECT id, price, date, book_id FROM testapp_booksold_unpartitioned'
+        )
+        # same names and definitions as before, now on the partitioned parent (and so on every partition).
+        for _, definition in indexes:
+            cursor.execute(definition)
+        cursor.execute('DROP TABLE testapp_booksold_unpartitioned')
+        cursor.execute('ALTER SEQUENCE testapp_booksold_partitioned_id_seq RENAME TO testapp_booksold_id_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0004_weekly_best_seller_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_booksold),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0005_partition_booksold_by_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateField(unique=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationSent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='testapp.book')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sent', to='testapp.notificationrun')),
+            ],
+            options={
+                'unique_together': {('run', 'book')},
+            },
+        ),
+    ]
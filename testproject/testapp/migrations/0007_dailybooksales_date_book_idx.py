@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+from testapp.migration_operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('testapp', '0006_notification_run_ledger'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='dailybooksales',
+            index=models.Index(fields=['date', 'book'], include=['total_sales', 'total_sold'],
+                               name='dailybooksales_date_book_idx'),
+        ),
+    ]
@@ -1,6 +1,11 @@
-from datetime import datetime, timedelta
-from django.db import models
-from django.db.models import Sum, Count
+from datetime import date, datetime, timedelta
+from django.db import connection, models, transaction, IntegrityError
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.utils import timezone
+from testapp import partitions
+
+# Matches best_sellers_last_week: sales dated on or after today - 7 days.
+LEADERBOARD_DAYS = 7
 
 
 class Author(models.Model):
@@ -10,9 +15,25 @@ class Author(models.Model):
 
 class BestSellerManager(models.Manager):
 
-    def bestsellers(self, since_date):
-        return self.annotate(total_sales=Sum('booksold__price'), total_sold=Count('booksold')). \
-            filter(booksold__date__gte=since_date)
+    # Reads from the daily rollup, so the cost depends on days * books rather than on total sales history.
+    # Filtering before annotating keeps the aggregate to a single join, which means total_sold isn't inflated.
+    # The author comes back in the same query (every notification needs it), limited to the columns they use.
+    def bestsellers(self, since):
+        return self.filter(daily_sales__date__gte=since). \
+            annotate(total_sales=Sum('daily_sales__total_sales'), total_sold=Sum('daily_sales__total_sold')). \
+            select_related('author'). \
+            only('title', 'author__name', 'author__phone_number')
+
+    # Best sellers from the live leaderboard, highest total_sales first. Reads k rows off the leaderboard's index
+    # rather than aggregating anything. Reading never writes: the window is slid forward by the advance_leaderboard
+    # command, run daily just after midnight, and until it has run the day that should have dropped out still counts.
+    def leaderboard(self, k=None):
+        best_sellers = self.filter(weekly_sales__total_sold__gt=0). \
+            annotate(total_sales=F('weekly_sales__total_sales'), total_sold=F('weekly_sales__total_sold')). \
+            select_related('author'). \
+            only('title', 'author__name', 'author__phone_number'). \
+            order_by('-weekly_sales__total_sales')
+        return best_sellers[:k] if k is not None else best_sellers
 
 
 class Book(models.Model):
@@ -24,10 +45,311 @@ class Book(models.Model):
     @classmethod
     def best_sellers_last_week(cls):
         last_week = datetime.now() - timedelta(days=7)
-        cls.objects.bestsellers(last_week)
+        return cls.objects.bestsellers(since=last_week)
+
+
+class BookSoldManager(models.Manager):
+
+    # Bulk loads sales from a CSV or JSON lines stream (see testapp.ingestion), returns an IngestReport.
+    def ingest(self, stream, file_format='csv', chunk_size=5000, use_copy=None):
+        from testapp.ingestion import ingest_sales
+        return ingest_sales(stream, file_format=file_format, chunk_size=chunk_size, use_copy=use_copy)
+
+    # Monthly partitions on PostgreSQL, see testapp.partitions. No-ops elsewhere.
+    def create_partitions(self, months_ahead=3, today=None):
+        today = today or date.today()
+        return partitions.create_partitions(
+            today, partitions.add_months(today.replace(day=1), months_ahead), using=self.db
+        )
+
+    def detach_partitions(self, retain_months=24, today=None):
+        today = today or date.today()
+        return partitions.detach_partitions(partitions.add_months(today.replace(day=1), -retain_months), using=self.db)
 
 
 class BookSold(models.Model):
     book = models.ForeignKey(Book, on_delete=models.PROTECT)
     price = models.IntegerField()
     date = models.DateField()
+
+    objects = BookSoldManager()
+
+    # On PostgreSQL the table is range partitioned by month on date (migration 0005), with (id, date) as its
+    # primary key. Django still treats id as the primary key, which the id sequence keeps unique.
+    #
+    # save() and delete() keep DailyBookSales and WeeklyBookSales in step: a new sale is added to them, an edited one
+    # is taken out as it was stored and added back as it is now, a deleted one is taken out. That costs a new sale
+    # three queries on top of its insert (an update of each rollup, and a read of the share locked leaderboard window)
+    # and three more for each rollup row it creates. An edit costs about nine on top of its update, a delete five.
+    # bulk_create() and QuerySet.update()/delete() don't go through them and leave the rollups stale. Load sales with
+    # BookSold.objects.ingest, and after other bulk changes run DailyBookSales.objects.rebuild() and
+    # WeeklyBookSales.objects.rebuild(today).
+    class Meta:
+        # Leading on date serves Version1's inline weekly range filter (bestsellers reads DailyBookSales instead),
+        # book and price make it covering for the aggregate. They're key columns rather than INCLUDEd ones, which
+        # serves the same index-only scans.
+        indexes = [
+            models.Index(fields=['date', 'book', 'price'], name='booksold_date_book_price_idx'),
+        ]
+
+    # (book_id, date, price) as currently stored, locked until the end of the transaction.
+    def _stored(self):
+        return BookSold.objects.select_for_update().filter(pk=self.pk).values_list('book_id', 'date', 'price').first()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            stored = None if self._state.adding else self._stored()
+            super().save(*args, **kwargs)
+            sale = (self.book_id, self.date, self.price)
+            if stored == sale:
+                return
+            if stored is not None:
+                _record_sale(*stored, count=-1)
+            _record_sale(*sale)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            stored = self._stored()
+            deleted = super().delete(*args, **kwargs)
+            if stored is not None:
+                _record_sale(*stored, count=-1)
+            return deleted
+
+
+# count=-1 takes the sale back out.
+def _record_sale(book_id, sold_on, price, count=1):
+    DailyBookSales.objects.record_sale(book_id, sold_on, price, count)
+    WeeklyBookSales.objects.record_sale(book_id, sold_on, price, count)
+
+
+# Adds to the row matching lookup, creating it if needed.
+def _increment(manager, total_sales, total_sold, **lookup):
+    updated = manager.filter(**lookup). \
+        update(total_sales=F('total_sales') + total_sales, total_sold=F('total_sold') + total_sold)
+    if updated:
+        return
+    try:
+        # savepoint, so losing the race to another writer doesn't break the surrounding transaction.
+        with transaction.atomic():
+            manager.create(total_sales=total_sales, total_sold=total_sold, **lookup)
+    except IntegrityError:
+        manager.filter(**lookup). \
+            update(total_sales=F('total_sales') + total_sales, total_sold=F('total_sold') + total_sold)
+
+
+# Adds (total_sales, total_sold) to each of the rows with the key_fields values in totals, {key: (total_sales,
+# total_sold)}, creating the missing ones. One INSERT ... ON CONFLICT DO UPDATE per batch of rows where the database
+# supports it (PostgreSQL, SQLite 3.24+), otherwise _increment for each.
+def _increment_many(manager, key_fields, totals):
+    totals = list(totals)
+    if not connection.features.supports_update_conflicts_with_target:
+        for key, (total_sales, total_sold) in totals:
+            _increment(manager, total_sales, total_sold, **dict(zip(key_fields, key)))
+        return
+    opts, quote_name = manager.model._meta, connection.ops.quote_name
+    fields = [opts.get_field(name) for name in key_fields]
+    table = quote_name(opts.db_table)
+    keys = [quote_name(field.column) for field in fields]
+    columns = keys + [quote_name('total_sales'), quote_name('total_sold')]
+    updates = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in columns[len(keys):])
+    batch_size = max(connection.ops.bulk_batch_size(columns, totals), 1)
+    for start in range(0, len(totals), batch_size):
+        batch = totals[start:start + batch_size]
+        row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        params = []
+        for key, (total_sales, total_sold) in batch:
+            params.extend(field.get_db_prep_value(value, connection) for field, value in zip(fields, key))
+            params.extend((total_sales, total_sold))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates}',
+                params,
+            )
+
+
+# (total_sales, total_sold) of (book_id, price, sold_on) sales, grouped by key(book_id, sold_on).
+def _totals(sales, key):
+    totals = {}
+    for book_id, price, sold_on in sales:
+        total_sales, total_sold = totals.get(key(book_id, sold_on), (0, 0))
+        totals[key(book_id, sold_on)] = (total_sales + price, total_sold + 1)
+    return totals.items()
+
+
+class DailyBookSalesManager(models.Manager):
+
+    # count=-1 takes a sale back out, dropping the row once nothing is left in it.
+    def record_sale(self, book_id, sold_on, price, count=1):
+        _increment(self, price * count, count, book_id=book_id, date=sold_on)
+        if count < 0:
+            self.filter(book_id=book_id, date=sold_on, total_sold__lte=0).delete()
+
+    # sales are (book_id, price, sold_on), totalled per book and day and added with one upsert for the lot.
+    def record_sales(self, sales):
+        _increment_many(self, ('book', 'date'), _totals(sales, lambda book_id, sold_on: (book_id, sold_on)))
+
+    # Recomputes the rollup from BookSold, after bulk changes that bypassed BookSold.save() and delete().
+    def rebuild(self):
+        with transaction.atomic():
+            self.all().delete()
+            totals = BookSold.objects.values('book_id', 'date'). \
+                annotate(total_sales=Sum('price'), total_sold=Count('id'))
+            self.bulk_create((DailyBookSales(**row) for row in totals.iterator()), batch_size=1000)
+
+
+# Per book, per day rollup of BookSold, maintained as sales are saved and deleted.
+class DailyBookSales(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    total_sales = models.IntegerField(default=0)
+    total_sold = models.IntegerField(default=0)
+
+    objects = DailyBookSalesManager()
+
+    class Meta:
+        unique_together = [('book', 'date')]
+        # bestsellers filters on date, so the (book, date) unique index can't range scan it. Leading on date can, and
+        # including the totals lets PostgreSQL answer the aggregate from the index alone.
+        indexes = [
+            models.Index(fields=['date', 'book'], include=['total_sales', 'total_sold'],
+                         name='dailybooksales_date_book_idx'),
+        ]
+
+
+class WeeklyBookSalesManager(models.Manager):
+
+    @staticmethod
+    def window_start(today):
+        return today - timedelta(days=LEADERBOARD_DAYS)
+
+    # count=-1 takes a sale back out, dropping the book once nothing is left. The window row is share locked until
+    # the end of the sale's transaction, so advance() can't subtract a day while a sale for it is being added (or miss
+    # one added just after it read the rollup). Sales don't block each other.
+    def record_sale(self, book_id, sold_on, price, count=1):
+        window = LeaderboardWindow.objects.for_sale()
+        if window is not None and sold_on >= window.start_date:
+            _increment(self, price * count, count, book_id=book_id)
+            if count < 0:
+                self.filter(book_id=book_id, total_sold__lte=0).delete()
+
+    # sales are (book_id, price, sold_on), totalled per book and added with one upsert for the lot.
+    def record_sales(self, sales):
+        window = LeaderboardWindow.objects.for_sale()
+        if window is None:
+            return
+        sales = (sale for sale in sales if sale[2] >= window.start_date)
+        _increment_many(self, ('book',), _totals(sales, lambda book_id, sold_on: (book_id,)))
+
+    # Slides the window forward to today, subtracting the daily rollups of the days that fell out of it. Cheap (one
+    # query) when the window is already current. Run daily by the advance_leaderboard command.
+    def advance(self, today):
+        start = self.window_start(today)
+        window = LeaderboardWindow.objects.filter(pk=1).first()
+        if window is not None and window.start_date >= start:
+            return
+        with transaction.atomic():
+            window = LeaderboardWindow.objects.select_for_update().filter(pk=1).first()
+            if window is None or window.start_date <= start - timedelta(days=LEADERBOARD_DAYS):
+                # nothing to keep, start over.
+                return self.rebuild(today)
+            if window.start_date >= start:
+                return
+            expired = DailyBookSales.objects. \
+                filter(book_id=OuterRef('book_id'), date__gte=window.start_date, date__lt=start). \
+                values('book_id')
+            self.filter(book__daily_sales__date__gte=window.start_date, book__daily_sales__date__lt=start). \
+                update(
+                    total_sales=F('total_sales') - Subquery(expired.annotate(s=Sum('total_sales')).values('s')),
+                    total_sold=F('total_sold') - Subquery(expired.annotate(n=Sum('total_sold')).values('n')),
+                )
+            self.filter(total_sold__lte=0).delete()
+            window.start_date = start
+            window.save()
+
+    # Recomputes the whole leaderboard from the daily rollup, e.g. to start it, or to correct drift from a sale
+    # that was in flight while the window advanced past its date.
+    def rebuild(self, today):
+        start = self.window_start(today)
+        with transaction.atomic():
+            LeaderboardWindow.objects.update_or_create(pk=1, defaults={'start_date': start})
+            self.all().delete()
+            totals = DailyBookSales.objects.filter(date__gte=start).values('book_id'). \
+                annotate(total_sales=Sum('total_sales'), total_sold=Sum('total_sold'))
+            self.bulk_create((WeeklyBookSales(**row) for row in totals.iterator()), batch_size=1000)
+
+
+# The live best seller leaderboard: per book totals over the last LEADERBOARD_DAYS, kept current as sales are saved
+# and as days fall out of the window (see LeaderboardWindow).
+class WeeklyBookSales(models.Model):
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='weekly_sales')
+    total_sales = models.IntegerField(default=0)
+    total_sold = models.IntegerField(default=0)
+
+    objects = WeeklyBookSalesManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_sales'], name='weeklybooksales_total_idx'),
+        ]
+
+
+class LeaderboardWindowManager(models.Manager):
+
+    # The window, locked FOR SHARE on PostgreSQL: concurrent sales can all hold it, advance()'s FOR UPDATE waits for
+    # them and they wait for it. Elsewhere (SQLite locks the whole database on write anyway) it's a plain read.
+    def for_sale(self):
+        if connection.vendor != 'postgresql':
+            return self.filter(pk=1).first()
+        return next(iter(self.raw(f'SELECT * FROM {self.model._meta.db_table} WHERE id = 1 FOR SHARE')), None)
+
+
+# Single row, the first day currently counted by WeeklyBookSales.
+class LeaderboardWindow(models.Model):
+    start_date = models.DateField()
+
+    objects = LeaderboardWindowManager()
+
+
+class NotificationRunManager(models.Manager):
+
+    # The run for the week starting window_start, created the first time it's asked for. The caller picks the window
+    # (and passes the same one to every restart and every shard), so a run restarted after midnight carries on from
+    # where it was rather than starting a new one.
+    def for_window(self, window_start):
+        run, _ = self.get_or_create(window_start=window_start)
+        return run
+
+
+# One best seller notification run per window. NotificationSent is its ledger of books already notified.
+class NotificationRun(models.Model):
+    window_start = models.DateField(unique=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    objects = NotificationRunManager()
+
+    # One query however many books have been notified, so skipping them doesn't cost a lookup per book.
+    def sent_book_ids(self):
+        return set(self.sent.values_list('book_id', flat=True))
+
+    # results are NotificationResults, the successful ones are written with a single insert. Notifications for
+    # books without a pk can't be recorded, and are sent again on a restart.
+    def record(self, results):
+        NotificationSent.objects.bulk_create(
+            [NotificationSent(run=self, book_id=result.notification.book_id) for result in results
+             if result.success and result.notification.book_id is not None],
+            ignore_conflicts=True
+        )
+
+    def finish(self):
+        self.finished_at = timezone.now()
+        self.save(update_fields=['finished_at'])
+
+
+class NotificationSent(models.Model):
+    run = models.ForeignKey(NotificationRun, on_delete=models.CASCADE, related_name='sent')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = [('run', 'book')]
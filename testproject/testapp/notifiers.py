@@ -1,18 +1,24 @@
+import asyncio
 from datetime import datetime, timedelta
 from django.db.models import Sum, Count
-from testapp.dwilio import DwilioClient, BestSellerNotification
+from testapp.dwilio import DwilioClient, default_async_client, BestSellerNotification, NotificationResult
 from testapp.models import Book
 from testapp.repository import BookRepository
 
 
+# Versions 1 to 3 build a DwilioClient when they send, unless given one.
 class BestsellerNotifierVersion1(object):
 
+    def __init__(self, dwilio_client=None):
+        self.dwilio_client = dwilio_client
+
     def notify_current_best_sellers(self):
-        dwilio_client = DwilioClient()
+        dwilio_client = self.dwilio_client or DwilioClient()
         last_week = datetime.now() - timedelta(days=7)
-        # This query is wrong, total_sold is not right. I don't care :p
-        best_sellers = Book.objects.annotate(total_sales=Sum('booksold__price'), total_sold=Count('booksold')).\
-            filter(booksold__date__gte=last_week)
+        # Filter before annotating, otherwise the filter adds a second join and total_sold is inflated.
+        best_sellers = Book.objects.filter(booksold__date__gte=last_week).\
+            annotate(total_sales=Sum('booksold__price'), total_sold=Count('booksold')).\
+            select_related('author')
         for book in best_sellers:
             notification = BestSellerNotification(book)
             dwilio_client.send_notification(notification)
@@ -20,8 +26,11 @@ class BestsellerNotifierVersion1(object):
 
 class BestsellerNotifierVersion2(object):
 
+    def __init__(self, dwilio_client=None):
+        self.dwilio_client = dwilio_client
+
     def notify_current_best_sellers(self):
-        dwilio_client = DwilioClient()
+        dwilio_client = self.dwilio_client or DwilioClient()
         last_week = datetime.now() - timedelta(days=7)
         best_sellers = Book.objects.bestsellers(since=last_week)
         for book in best_sellers:
@@ -31,8 +40,11 @@ class BestsellerNotifierVersion2(object):
 
 class BestsellerNotifierVersion3(object):
 
+    def __init__(self, dwilio_client=None):
+        self.dwilio_client = dwilio_client
+
     def notify_current_best_sellers(self):
-        dwilio_client = DwilioClient()
+        dwilio_client = self.dwilio_client or DwilioClient()
         best_sellers = Book.best_sellers_last_week()
         for book in best_sellers:
             notification = BestSellerNotification(book)
@@ -41,12 +53,77 @@ class BestsellerNotifierVersion3(object):
 
 class BestsellerNotifierVersion4(object):
 
-    def __init__(self, book_repository=None, dwilio_client=None):
-        self.book_repository = book_repository or BookRepository()
+    # Streams best sellers into send_notifications, so the first batch goes out as soon as the first chunk arrives.
+    # rows=True builds the notifications from the repository's best_seller_notifications_last_week (see
+    # BookRepository), straight from query rows with no model instances at all. rows=False wraps books from
+    # best_sellers_last_week, which is all a simpler repository (like the fakes in the tests) needs. By default it's
+    # rows with the BookRepository built here, and books with a repository passed in.
+    def __init__(self, book_repository=None, dwilio_client=None, rows=None):
+        self.rows = rows if rows is not None else book_repository is None
+        self.book_repository = book_repository or BookRepository(stream=True)
         self.dwilio_client = dwilio_client or DwilioClient()
 
-    def notify_current_best_sellers(self):
+    # Given a NotificationRun (see NotificationRun.objects.for_window), books already in its ledger are skipped and each
+    # batch sent is recorded as it completes, so a crashed run can be restarted and only sends what's left. Batches
+    # in flight when it crashed may go out twice. The run is finished once everything has been sent, unless finish is
+    # False (a shard of a run, see testapp.sharding).
+    def notify_current_best_sellers(self, run=None, finish=True):
+        if self.rows:
+            notifications = self.book_repository.best_seller_notifications_last_week()
+        else:
+            best_sellers = self.book_repository.best_sellers_last_week()
+            notifications = (BestSellerNotification(book) for book in best_sellers)
+        if run is None:
+            return self.dwilio_client.send_notifications(notifications)
+        sent = run.sent_book_ids()
+        notifications = (notification for notification in notifications if notification.book_id not in sent)
+        results = self.dwilio_client.send_notifications(notifications, on_batch=run.record)
+        if finish and all(result.success for result in results):
+            run.finish()
+        return results
+
+
+# Async QuerySets (Django >= 4.1) are iterated with async for, plain collections (e.g. from a fake repository) as-is.
+async def _aiter(iterable):
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+class AsyncBestsellerNotifier(object):
+
+    def __init__(self, book_repository=None, dwilio_client=None, max_in_flight=None):
+        self.book_repository = book_repository or BookRepository()
+        self.dwilio_client = dwilio_client or default_async_client()
+        # any more outstanding than the client can send at once would only queue up in it.
+        self.max_in_flight = max_in_flight or self.dwilio_client.max_in_flight
+
+    async def notify_current_best_sellers(self):
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async def _send(notification):
+            try:
+                await self.dwilio_client.send_notification(notification)
+                return NotificationResult(notification, True)
+            except Exception as e:
+                return NotificationResult(notification, False, e)
+            finally:
+                in_flight.release()
+
+        sends = []
         best_sellers = self.book_repository.best_sellers_last_week()
-        for book in best_sellers:
-            notification = BestSellerNotification(book)
-            self.dwilio_client.send_notification(notification)
\ No newline at end of file
+        try:
+            async for book in _aiter(best_sellers):
+                # backpressure, stop pulling rows while max_in_flight sends are outstanding.
+                await in_flight.acquire()
+                sends.append(asyncio.ensure_future(_send(BestSellerNotification(book))))
+        except BaseException:
+            # reading best sellers failed part way, don't leave the sends already started running unattended.
+            for send in sends:
+                send.cancel()
+            await asyncio.gather(*sends, return_exceptions=True)
+            raise
+        return await asyncio.gather(*sends)
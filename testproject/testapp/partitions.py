@@ -0,0 +1,100 @@
+import re
+from datetime import date
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# BookSold is range partitioned by month on date in PostgreSQL (see migration 0005), one partition per month named
+# testapp_booksold_pYYYY_MM, plus a default partition catching anything outside them. Queries filtering on date
+# (e.g. the last week's sales) only touch the partitions they need, and old months can be detached instead of
+# vacuumed and reindexed forever. Everything here is a no-op on other backends, and works on the using database
+# (migrations pass their schema editor's).
+
+TABLE = 'testapp_booksold'
+DEFAULT_PARTITION = f'{TABLE}_default'
+_PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+class PartitionException(Exception):
+    pass
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'postgresql'
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+# First days of every month from start's month to end's month, inclusive.
+def months_between(start, end):
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04}_{month.month:02}'
+
+
+def existing_partitions(cursor):
+    cursor.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE parent.relname = %s',
+        [TABLE]
+    )
+    return {name for name, in cursor.fetchall()}
+
+
+# Creates any missing monthly partitions between start and end. Returns the names of the ones created.
+# Sales already in the default partition for a new month are moved into it: PostgreSQL refuses to add a partition
+# whose range has rows in the default one. So each partition is created on its own, filled from the default
+# partition, then attached, in one transaction.
+def create_partitions(start, end, using=DEFAULT_DB_ALIAS):
+    if not is_partitioned(using):
+        return []
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    created = []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        existing = existing_partitions(cursor)
+        for month in months_between(start, end):
+            name = partition_name(month)
+            if name in existing:
+                continue
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+            if cursor.fetchone()[0]:
+                raise PartitionException(f'{name} exists but isn\'t a partition of {TABLE}, it was probably '
+                                         f'detached. Archive and drop it, or reattach it, first.')
+            bounds = [month, add_months(month, 1)]
+            cursor.execute(f'CREATE TABLE {quote_name(name)} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) '
+                f'INSERT INTO {quote_name(name)} SELECT * FROM moved',
+                bounds
+            )
+            cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {quote_name(name)} FOR VALUES FROM (%s) TO (%s)',
+                           bounds)
+            created.append(name)
+    return created
+
+
+# Detaches (but keeps, for archiving) monthly partitions that end on or before before's month.
+# Returns the names of the ones detached.
+def detach_partitions(before, using=DEFAULT_DB_ALIAS):
+    if not is_partitioned(using):
+        return []
+    connection = connections[using]
+    cutoff = before.replace(day=1)
+    detached = []
+    with connection.cursor() as cursor:
+        for name in sorted(existing_partitions(cursor)):
+            match = _PARTITION_NAME.match(name)
+            if match and add_months(date(int(match[1]), int(match[2]), 1), 1) <= cutoff:
+                cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {connection.ops.quote_name(name)}')
+                detached.append(name)
+    return detached
@@ -0,0 +1,97 @@
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+from time import perf_counter
+
+from django.db import connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Placeholders and literals vary between otherwise identical queries, IN lists vary in length too.
+_FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+# Records every query run on the using connection while the block (or decorated function) runs, and how long the
+# database took over them, whatever DEBUG is. On the way out it raises QueryBudgetExceeded if there were more than
+# queries queries, more than seconds spent in the database, or any one query shape (see fingerprint) ran more than
+# duplicates + 1 times, the tell-tale of an N+1. Budgets left as None aren't checked.
+#
+#   with QueryBudget(queries=1, duplicates=0) as budget:
+#       list(BookRepository().best_sellers_last_week())
+#
+# Only the thread that entered it is watched (Django connections are per thread), so queries run on other threads,
+# by executor workers, sync_to_async(thread_sensitive=False) calls or sharded notifier processes, aren't counted or
+# timed. Declare budgets in the thread that runs the queries. The time is what execute took, so rows fetched later
+# from a streamed cursor aren't included. As a decorator every call gets a budget of its own, so recursive and
+# concurrent calls don't share (and clobber) one.
+class QueryBudget(ContextDecorator):
+
+    def __init__(self, queries=None, seconds=None, duplicates=None, using='default'):
+        self.queries = queries
+        self.seconds = seconds
+        self.duplicates = duplicates
+        self.using = using
+        self.executed = []
+
+    def _recreate_cm(self):
+        return QueryBudget(self.queries, self.seconds, self.duplicates, self.using)
+
+    def _execute(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.executed.append((sql, perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.executed)
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, seconds in self.executed)
+
+    # {fingerprint: times run} for the query shapes that ran more than once.
+    def duplicated(self):
+        counts = Counter(fingerprint(sql) for sql, _ in self.executed)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    def __enter__(self):
+        self.executed = []
+        self._wrapper = connections[self.using].execute_wrapper(self._execute)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        if exc_info[0] is None:
+            self.check()
+
+    def check(self):
+        problems = []
+        if self.queries is not None and self.count > self.queries:
+            problems.append(f'{self.count} queries, the budget is {self.queries}')
+        if self.seconds is not None and self.total_seconds > self.seconds:
+            problems.append(f'{self.total_seconds:.3f}s in the database, the budget is {self.seconds}s')
+        if self.duplicates is not None:
+            for sql, count in self.duplicated().items():
+                if count - 1 > self.duplicates:
+                    problems.append(f'ran {count} times, the budget is {self.duplicates + 1}: {sql}')
+        if problems:
+            queries = '\n'.join(f'  {seconds * 1000:.1f}ms {sql}' for sql, seconds in self.executed)
+            raise QueryBudgetExceeded('Query budget exceeded:\n' + '\n'.join(problems) + '\nQueries:\n' + queries)
@@ -1,9 +1,106 @@
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from copy import copy
+from datetime import date, datetime, timedelta
+from django.db.models.functions import Mod
+from testapp import instrumentation
+from testapp.dwilio import BestSellerNotification
 from testapp.models import Book
 
 
 class BookRepository(object):
 
+    # stream=True hands back an iterator over chunk_size rows at a time instead of a QuerySet. On PostgreSQL that's
+    # a named (server-side) cursor, so the rows fetched and not yet consumed never exceed chunk_size, however many
+    # books qualify, and consumers can start before the query is exhausted. Whatever the consumer keeps is on top of
+    # that (DwilioClient.send_notifications keeps a result per notification).
+    # leaderboard=True reads from the live leaderboard instead of aggregating the daily rollup.
+    # shard=(index, count) limits it to the books with book_id % count == index, see testapp.sharding.
+    def __init__(self, stream=False, chunk_size=2000, leaderboard=False, shard=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.leaderboard = leaderboard
+        self.shard = shard
+
+    def _best_sellers_last_week(self):
+        if self.leaderboard:
+            best_sellers = Book.objects.leaderboard()
+        else:
+            last_week = datetime.now() - timedelta(days=7)
+            best_sellers = Book.objects.bestsellers(since=last_week)
+        if self.shard is not None:
+            index, count = self.shard
+            best_sellers = best_sellers.alias(shard=Mod('pk', count)).filter(shard=index)
+        return best_sellers
+
+    # With instrumentation on, the query's time (and row count) is recorded as name_seconds (and name_rows) as the
+    # results are fetched. Either way the results are a QuerySet, or an iterator when streaming.
+    def _results(self, name, queryset):
+        queryset = instrumentation.timed_queryset(name, queryset, stream=self.stream, leaderboard=self.leaderboard)
+        if self.stream:
+            return queryset.iterator(chunk_size=self.chunk_size)
+        return queryset
+
     def best_sellers_last_week(self):
-        last_week = datetime.now() - timedelta(days=7)
-        return Book.objects.bestsellers(since=last_week)
+        return self._results('repository_best_sellers', self._best_sellers_last_week())
+
+    # The same best sellers as plain rows turned into notifications, without building Book and Author instances.
+    def best_seller_notifications_last_week(self):
+        rows = self._results('repository_best_seller_notifications',
+                             self._best_sellers_last_week().values_list(*BestSellerNotification.FIELDS))
+        return (BestSellerNotification.from_row(row) for row in rows)
+
+    # The k best sellers by total sales, straight off the leaderboard.
+    def top_sellers_last_week(self, k):
+        return instrumentation.timed_queryset('repository_top_sellers', Book.objects.leaderboard(k))
+
+
+# A BookRepository that needs no database, for fast domain tests. Sales are kept in date-sorted arrays, one shared
+# across all books (to find who sold anything since a date) and one per book with running price totals (to sum a
+# book's sales since a date with a binary search). Books can be Book instances, or anything else with the attributes
+# the caller needs. Like the database, books are told apart by pk (unsaved ones by identity), and every query hands
+# back fresh copies with total_sales and total_sold set on them like the ORM's annotations, so the books added
+# aren't touched.
+class InMemoryBookRepository(object):
+
+    def __init__(self, today=date.today):
+        self.today = today
+        self._dates = []
+        self._date_books = []
+        self._books = {}
+
+    @staticmethod
+    def _key(book):
+        pk = getattr(book, 'pk', None)
+        return ('pk', pk) if pk is not None else ('id', id(book))
+
+    def add_sale(self, book, price, date):
+        key = self._key(book)
+        index = bisect_right(self._dates, date)
+        self._dates.insert(index, date)
+        self._date_books.insert(index, key)
+        _, dates, totals = self._books.setdefault(key, (book, [], [0]))
+        index = bisect_right(dates, date)
+        dates.insert(index, date)
+        totals.insert(index + 1, totals[index])
+        for i in range(index + 1, len(totals)):
+            totals[i] += price
+
+    def best_sellers(self, since):
+        best_sellers = []
+        for key in dict.fromkeys(self._date_books[bisect_left(self._dates, since):]):
+            book, dates, totals = self._books[key]
+            index = bisect_left(dates, since)
+            best_seller = copy(book)
+            best_seller.total_sales = totals[-1] - totals[index]
+            best_seller.total_sold = len(dates) - index
+            best_sellers.append(best_seller)
+        return best_sellers
+
+    def best_sellers_last_week(self):
+        return self.best_sellers(self.today() - timedelta(days=7))
+
+    def best_seller_notifications_last_week(self):
+        return [BestSellerNotification(book) for book in self.best_sellers_last_week()]
+
+    def top_sellers_last_week(self, k):
+        return sorted(self.best_sellers_last_week(), key=lambda book: book.total_sales, reverse=True)[:k]
@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from time import monotonic
+
+import django
+from django.db import connections
+
+from testapp.dwilio import DwilioClient
+from testapp.models import NotificationRun
+from testapp.notifiers import BestsellerNotifierVersion4
+from testapp.repository import BookRepository
+
+
+# Splits the weekly notification run into count shards by book_id (book_id % count), each streamed and sent on its
+# own, either by separate `manage.py notify_best_sellers --shard i/N` processes or by notify_sharded's process pool.
+# Separate --shard processes can't tell when the others are done, so a resumable run sharded that way is finished by
+# running notify_best_sellers once more, unsharded, with the same --resume: it sends whatever the shards missed (none,
+# if they all succeeded) and then finishes the run.
+
+
+def parse_shard(value):
+    index, _, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f'Expected a shard as i/N, got {value!r}')
+    if not 0 <= index < count:
+        raise ValueError(f'Shard {index} is out of range for {count} shards')
+    return index, count
+
+
+@dataclass(frozen=True)
+class ShardReport:
+    index: int
+    count: int
+    sent: int
+    failed: int
+    seconds: float
+
+
+@dataclass(frozen=True)
+class RunReport:
+    shards: tuple
+
+    @property
+    def sent(self):
+        return sum(shard.sent for shard in self.shards)
+
+    @property
+    def failed(self):
+        return sum(shard.failed for shard in self.shards)
+
+    # Shards run side by side, so the run takes as long as its slowest shard.
+    @property
+    def seconds(self):
+        return max((shard.seconds for shard in self.shards), default=0.0)
+
+    @property
+    def sent_per_second(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+
+# Sends one shard. run_id is a NotificationRun's pk (rather than the run, so it can be handed to another process);
+# the shard then skips books already in its ledger and records what it sends, but leaves finishing the run to whoever
+# knows every shard is done.
+def notify_shard(index, count, run_id=None, chunk_size=2000):
+    started = monotonic()
+    run = NotificationRun.objects.get(pk=run_id) if run_id is not None else None
+    notifier = BestsellerNotifierVersion4(
+        book_repository=BookRepository(stream=True, chunk_size=chunk_size, shard=(index, count)),
+        dwilio_client=DwilioClient(),
+        rows=True,
+    )
+    results = notifier.notify_current_best_sellers(run, finish=False)
+    failed = sum(1 for result in results if not result.success)
+    return ShardReport(index, count, len(results) - failed, failed, monotonic() - started)
+
+
+def _setup_worker():
+    django.setup()
+
+
+# Runs all count shards at once on a local process pool (or executor, anything with submit) and merges their reports.
+# Given a run, it is finished once every shard has sent everything.
+def notify_sharded(count, run=None, chunk_size=2000, executor=None):
+    if count < 1:
+        raise ValueError(f'Expected at least one shard, got {count}')
+    if executor is None:
+        # Forked workers mustn't share the parent's database connections, they open their own.
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=count, initializer=_setup_worker)
+    with executor:
+        futures = [executor.submit(notify_shard, index, count, run and run.pk, chunk_size) for index in range(count)]
+        report = RunReport(tuple(future.result() for future in futures))
+    if run is not None and not report.failed:
+        run.finish()
+    return report
@@ -0,0 +1,46 @@
+from concurrent.futures import Future
+from threading import Lock
+
+from testapp.slow_formatter import SlowStringFormatter
+
+
+# Concurrent calls for the same key share one in-flight computation. The first caller runs fn, everyone else waits
+# for its result (or its exception) for up to timeout seconds, then gets a TimeoutError.
+class SingleFlight(object):
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = Lock()
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+        return future.result(timeout)
+
+
+# Collapses concurrent identical really_slow_string_format calls into one. Combine with CachingStringFormatter
+# (wrapping this) to also coalesce concurrent cache misses.
+class SingleFlightStringFormatter(object):
+
+    def __init__(self, formatter=None, timeout=None):
+        self.formatter = formatter or SlowStringFormatter()
+        self.timeout = timeout
+        self._single_flight = SingleFlight()
+
+    def really_slow_string_format(self, string1, string2):
+        return self._single_flight.do(
+            (string1, string2),
+            lambda: self.formatter.really_slow_string_format(string1, string2),
+            self.timeout,
+        )
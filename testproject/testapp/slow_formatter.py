@@ -1,10 +1,13 @@
 from time import sleep
 
+from testapp import instrumentation
+
 
 class SlowStringFormatter(object):
 
     def really_slow_string_format(self, string1, string2):
-        self._this_is_the_slow_part()
+        with instrumentation.timer('formatter_format_seconds'):
+            self._this_is_the_slow_part()
         return f'{string1} {string2}'
 
     def _this_is_the_slow_part(self):
@@ -0,0 +1,15 @@
+from datetime import date
+
+from ..models import Author, Book, BookSold
+
+
+# count best sellers for this week, Book i by Author i (whose phone number ends in i, as four digits), each sold once
+# today.
+def create_best_sellers(count, price=10):
+    books = []
+    for i in range(count):
+        author = Author.objects.create(name=f'Author {i}', phone_number=f'+1306555{i:04}')
+        book = Book.objects.create(title=f'Book {i}', author=author)
+        BookSold.objects.create(book=book, price=price, date=date.today())
+        books.append(book)
+    return books
@@ -0,0 +1,34 @@
+from ..dwilio import DwilioApiException, DwilioClient
+
+
+# A DwilioClient that records what it would have sent instead of sending it, so the real batching, concurrency and
+# results still run. sent holds (to_number, message) pairs, per client. Requests for any of fail_numbers fail.
+class RecordingDwilioClient(DwilioClient):
+
+    def __init__(self, fail_numbers=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_numbers = set(fail_numbers)
+        self.sent = []
+
+    @property
+    def sent_numbers(self):
+        return [to_number for to_number, _ in self.sent]
+
+    def _send_to_api(self, to_number, message):
+        self._send_batch_to_api([(to_number, message)])
+
+    def _send_batch_to_api(self, payloads):
+        if any(to_number in self.fail_numbers for to_number, _ in payloads):
+            raise DwilioApiException(500)
+        self.sent.extend(payloads)
+
+
+# The same for AsyncDwilioClient.
+class AsyncRecordingDwilioClient(object):
+    max_in_flight = 10
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_notification(self, notification):
+        self.sent.append((notification.to_number(), notification.message()))
@@ -0,0 +1,108 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import monotonic, sleep
+
+
+# A local stand in for the Dwilio API, so the real HTTP clients can be tested without mocking their internals.
+# Records every message it receives, the path and Idempotency-Key header of every request, and the client port of each
+# connection it accepted, and answers with status_code and response_body (or whatever respond() returns).
+# Connections are kept alive unless the client asks otherwise, or until they've been idle for idle_timeout seconds.
+# Quotas like a real provider's can be simulated: more than rate_limit messages a second (after a burst of burst),
+# or more than max_concurrent requests at once, are answered 429 and counted in throttled. Every request takes
+# latency seconds. 429s carry retry_after, if given, as their Retry-After header.
+class FakeDwilioServer(object):
+
+    def __init__(self, status_code=201, response_body=None, rate_limit=None, burst=None, max_concurrent=None,
+                 latency=0, retry_after=None, idle_timeout=None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.response_body = response_body
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else rate_limit
+        self.max_concurrent = max_concurrent
+        self.latency = latency
+        self.idle_timeout = idle_timeout
+        self.messages = []
+        self.requests = []
+        self.connections = set()
+        self.throttled = 0
+        self.max_seen_concurrent = 0
+        self._concurrent = 0
+        self._allowance = self.burst
+        self._allowance_updated = monotonic()
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def respond(self, message):
+        return self.status_code, self.response_body
+
+    # Whether a request for count messages is over quota, and if not takes them out of the allowance.
+    def _over_quota(self, count):
+        if self.max_concurrent is not None and self._concurrent > self.max_concurrent:
+            return True
+        if self.rate_limit is None:
+            return False
+        now = monotonic()
+        self._allowance = min(self.burst, self._allowance + (now - self._allowance_updated) * self.rate_limit)
+        self._allowance_updated = now
+        if self._allowance < count:
+            return True
+        self._allowance -= count
+        return False
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            timeout = fake.idle_timeout
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                message = json.loads(body)
+                with fake._lock:
+                    fake.requests.append((self.path, self.headers.get('Idempotency-Key')))
+                    fake.connections.add(self.client_address[1])
+                    fake._concurrent += 1
+                    fake.max_seen_concurrent = max(fake.max_seen_concurrent, fake._concurrent)
+                    throttled = fake._over_quota(len(message.get('messages', [message])))
+                    if throttled:
+                        fake.throttled += 1
+                    else:
+                        fake.messages.append(message)
+                try:
+                    if fake.latency:
+                        sleep(fake.latency)
+                    status_code, response_body = (429, None) if throttled else fake.respond(message)
+                finally:
+                    with fake._lock:
+                        fake._concurrent -= 1
+                content = json.dumps(response_body).encode() if response_body is not None else b''
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                if status_code == 429 and fake.retry_after is not None:
+                    self.send_header('Retry-After', str(fake.retry_after))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
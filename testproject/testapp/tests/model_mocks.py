@@ -0,0 +1,48 @@
+from functools import lru_cache
+from unittest.mock import NonCallableMagicMock
+
+from django.db import models
+from django.db.models.base import ModelState
+
+
+# Speccing and autospeccing walk the whole class (dir() plus a getattr per attribute) for every mock made, and still
+# get Django models wrong (see tests_8_speccing_django_models). These helpers work the spec out once per class and
+# reuse it, so each new mock is cheap.
+#
+# mock_model(Book) passes isinstance checks, has the _state Django expects of a model instance, and its forward
+# relations (mock_book.author) are mock_models of the related model, so they can be assigned to real instances.
+# mock_spec(BestSellerManager) specs anything else, e.g. managers.
+
+
+@lru_cache(maxsize=None)
+def _mock_class(cls):
+    names = list(dir(cls))
+    relations = {}
+    if issubclass(cls, models.Model):
+        names.append('_state')
+        relations = {field.name: field.related_model for field in cls._meta.get_fields()
+                     if field.concrete and (field.many_to_one or field.one_to_one)}
+
+    class SpecMock(NonCallableMagicMock):
+
+        def _get_child_mock(self, **kw):
+            related_model = relations.get(kw.get('name'))
+            if related_model is not None:
+                return mock_model(related_model)
+            return super()._get_child_mock(**kw)
+
+    SpecMock.__name__ = f'{cls.__name__}Mock'
+    return SpecMock, names
+
+
+def mock_spec(cls, **attrs):
+    mock_class, names = _mock_class(cls)
+    mock = mock_class(spec=names, **attrs)
+    mock.__class__ = cls
+    return mock
+
+
+def mock_model(model, **attrs):
+    mock = mock_spec(model, **attrs)
+    mock._state = ModelState()
+    return mock
@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+from django.test import TestCase
+
+from ..models import Author, Book, BookSold, DailyBookSales
+
+
+# The rollup is maintained as sales are saved, so best sellers never have to touch the BookSold table.
+class TestDailySalesRollup(TestCase):
+
+    def setUp(self):
+        self.today = date.today()
+        self.two_weeks_ago = self.today - timedelta(days=14)
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        self.book = Book.objects.create(title='Do This', author=author)
+
+    def test_sales_are_rolled_up_per_book_per_day(self):
+        BookSold.objects.create(book=self.book, price=10, date=self.today)
+        BookSold.objects.create(book=self.book, price=8, date=self.today)
+        BookSold.objects.create(book=self.book, price=5, date=self.two_weeks_ago)
+
+        rollup = DailyBookSales.objects.get(book=self.book, date=self.today)
+        self.assertEqual(18, rollup.total_sales)
+        self.assertEqual(2, rollup.total_sold)
+        self.assertEqual(2, DailyBookSales.objects.count())
+
+    def test_updating_a_sale_does_not_count_it_twice(self):
+        sale = BookSold.objects.create(book=self.book, price=10, date=self.today)
+        sale.save()
+
+        rollup = DailyBookSales.objects.get(book=self.book, date=self.today)
+        self.assertEqual(1, rollup.total_sold)
+
+    def test_editing_a_sale_moves_it_between_days(self):
+        sale = BookSold.objects.create(book=self.book, price=10, date=self.today)
+        BookSold.objects.create(book=self.book, price=8, date=self.two_weeks_ago)
+        sale.price = 12
+        sale.date = self.two_weeks_ago
+        sale.save()
+
+        self.assertFalse(DailyBookSales.objects.filter(book=self.book, date=self.today).exists())
+        rollup = DailyBookSales.objects.get(book=self.book, date=self.two_weeks_ago)
+        self.assertEqual((20, 2), (rollup.total_sales, rollup.total_sold))
+
+    def test_editing_only_the_price(self):
+        sale = BookSold.objects.create(book=self.book, price=10, date=self.today)
+        sale.price = 4
+        sale.save()
+
+        rollup = DailyBookSales.objects.get(book=self.book, date=self.today)
+        self.assertEqual((4, 1), (rollup.total_sales, rollup.total_sold))
+
+    def test_deleting_a_sale_takes_it_out(self):
+        BookSold.objects.create(book=self.book, price=10, date=self.today)
+        sale = BookSold.objects.create(book=self.book, price=8, date=self.today)
+        sale.delete()
+
+        rollup = DailyBookSales.objects.get(book=self.book, date=self.today)
+        self.assertEqual((10, 1), (rollup.total_sales, rollup.total_sold))
+
+    # QuerySet.update() skips save(), the rollup has to be rebuilt afterwards.
+    def test_rebuild_after_bulk_update(self):
+        BookSold.objects.create(book=self.book, price=10, date=self.today)
+        BookSold.objects.filter(book=self.book).update(price=30)
+
+        DailyBookSales.objects.rebuild()
+
+        rollup = DailyBookSales.objects.get(book=self.book, date=self.today)
+        self.assertEqual((30, 1), (rollup.total_sales, rollup.total_sold))
+
+    def test_bestsellers_only_count_sales_since_date(self):
+        BookSold.objects.create(book=self.book, price=10, date=self.today)
+        BookSold.objects.create(book=self.book, price=8, date=self.today - timedelta(days=1))
+        BookSold.objects.create(book=self.book, price=10, date=self.two_weeks_ago)
+        BookSold.objects.create(book=self.book, price=8, date=self.two_weeks_ago)
+
+        best_sellers = list(Book.objects.bestsellers(since=self.today - timedelta(days=7)))
+
+        self.assertEqual([self.book], best_sellers)
+        self.assertEqual(18, best_sellers[0].total_sales)
+        self.assertEqual(2, best_sellers[0].total_sold)
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+from django.db import connection
+from django.db.models import Sum, Count
+from django.test import TestCase
+
+from ..models import Author, Book, BookSold
+
+
+# Regression tests for the query plans, not the results. If someone drops or reorders the date leading indexes the
+# weekly best seller queries silently go back to scanning every sale (or every day) ever recorded.
+class TestWeeklyBestSellerQueryPlan(TestCase):
+
+    def setUp(self):
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        book = Book.objects.create(title='Do This', author=author)
+        BookSold.objects.create(book=book, price=10, date=datetime.now())
+        if connection.vendor == 'postgresql':
+            # a test sized table is always cheaper to seq scan, so take that option away from the planner.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.last_week = datetime.now() - timedelta(days=7)
+
+    # What bestsellers (and so Versions 2 to 4) run.
+    def test_bestsellers_use_rollup_date_index(self):
+        plan = Book.objects.bestsellers(since=self.last_week).explain()
+
+        self.assertIn('dailybooksales_date_book_idx', plan)
+
+    # Version1's inline query still aggregates BookSold. On PostgreSQL BookSold is partitioned, so the plan names each
+    # partition's copy of the index (testapp_booksold_p2021_03_date_book_id_price_idx, say) instead.
+    def test_inline_weekly_query_uses_date_index(self):
+        plan = Book.objects.filter(booksold__date__gte=self.last_week).\
+            annotate(total_sales=Sum('booksold__price'), total_sold=Count('booksold')).explain()
+
+        if connection.vendor == 'postgresql':
+            self.assertRegex(plan, r'Index (Only )?Scan using testapp_booksold_p\d{4}_\d{2}_date_book_id_price_idx')
+        else:
+            self.assertIn('booksold_date_book_price_idx', plan)
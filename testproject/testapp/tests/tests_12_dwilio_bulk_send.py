@@ -0,0 +1,93 @@
+from threading import Lock
+from time import sleep
+from django.test import SimpleTestCase
+
+from ..dwilio import BestSellerNotification, DwilioClient, NotificationResult
+from ..models import Author, Book
+
+
+# Override the network call only, the batching and concurrency are what's under test.
+class FakeBulkDwilioClient(DwilioClient):
+
+    def __init__(self, fail_numbers=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_numbers = set(fail_numbers)
+        self.batches = []
+        self.in_flight = 0
+        self.max_seen_in_flight = 0
+        self._lock = Lock()
+
+    def _send_batch_to_api(self, payloads):
+        with self._lock:
+            self.batches.append(payloads)
+            self.in_flight += 1
+            self.max_seen_in_flight = max(self.max_seen_in_flight, self.in_flight)
+        sleep(0.01)
+        with self._lock:
+            self.in_flight -= 1
+        if any(to_number in self.fail_numbers for to_number, _ in payloads):
+            raise Exception('Dwilio said no')
+
+
+class FakeNotification(object):
+
+    def __init__(self, number):
+        self.number = number
+
+    def to_number(self):
+        return self.number
+
+    def message(self):
+        return f'hello {self.number}'
+
+
+class TestDwilioSendNotifications(SimpleTestCase):
+
+    def test_notifications_are_sent_in_batches(self):
+        client = FakeBulkDwilioClient(batch_size=3)
+        notifications = [FakeNotification(str(i)) for i in range(7)]
+
+        client.send_notifications(notifications)
+
+        self.assertEqual([3, 3, 1], sorted((len(batch) for batch in client.batches), reverse=True))
+        self.assertIn(('0', 'hello 0'), client.batches[0])
+
+    def test_results_are_returned_per_notification_in_order(self):
+        client = FakeBulkDwilioClient(batch_size=2, max_in_flight=4)
+        notifications = [FakeNotification(str(i)) for i in range(9)]
+
+        results = client.send_notifications(iter(notifications))
+
+        self.assertEqual(notifications, [result.notification for result in results])
+        self.assertTrue(all(result.success for result in results))
+
+    def test_a_failed_batch_fails_only_its_own_notifications(self):
+        client = FakeBulkDwilioClient(fail_numbers=['3'], batch_size=2)
+        notifications = [FakeNotification(str(i)) for i in range(6)]
+
+        results = client.send_notifications(notifications)
+
+        self.assertEqual([True, True, False, False, True, True], [result.success for result in results])
+        self.assertEqual('Dwilio said no', str(results[2].error))
+
+    def test_in_flight_requests_are_bounded(self):
+        client = FakeBulkDwilioClient(batch_size=1, max_in_flight=3)
+
+        client.send_notifications(FakeNotification(str(i)) for i in range(20))
+
+        self.assertEqual(20, len(client.batches))
+        self.assertLessEqual(client.max_seen_in_flight, 3)
+
+    def test_send_notifications_with_real_notifications(self):
+        book = Book(title='Do This', author=Author(name='Cam McHugh', phone_number='+13065551111'))
+        book.total_sold = 2
+        book.total_sales = 18
+        client = FakeBulkDwilioClient()
+
+        results = client.send_notifications([BestSellerNotification(book)])
+
+        self.assertEqual(
+            [('+13065551111', 'Congratulations Cam McHugh, your book Do This sold 2 $18 this week')],
+            client.batches[0]
+        )
+        self.assertIsInstance(results[0], NotificationResult)
@@ -0,0 +1,186 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from datetime import date
+from django.test import SimpleTestCase, TestCase
+
+from ..dwilio import AsyncDwilioClient, DwilioApiException, default_async_client
+from ..models import Author, Book, BookSold
+from ..notifiers import AsyncBestsellerNotifier
+from ..throttling import TokenBucket
+from ..transport import PooledHttpTransport
+from .fake_dwilio_server import FakeDwilioServer
+
+
+def make_best_seller(title, name, phone_number):
+    book = Book(title=title, author=Author(name=name, phone_number=phone_number))
+    book.total_sold = 1
+    book.total_sales = 10
+    return book
+
+
+class FakeRepository(object):
+
+    def __init__(self, books):
+        self.books = books
+
+    def best_sellers_last_week(self):
+        return self.books
+
+
+class SlowAsyncDwilioClient(object):
+    max_in_flight = 10
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_seen_in_flight = 0
+        self.sent = []
+
+    async def send_notification(self, notification):
+        self.in_flight += 1
+        self.max_seen_in_flight = max(self.max_seen_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        self.sent.append(notification.to_number())
+
+
+class HangingAsyncDwilioClient(object):
+    max_in_flight = 10
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+
+    async def send_notification(self, notification):
+        self.started += 1
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+class FailingRepository(object):
+
+    def __init__(self, books):
+        self.books = books
+
+    async def best_sellers_last_week(self):
+        for book in self.books:
+            yield book
+            await asyncio.sleep(0.01)
+        raise RuntimeError('lost the database')
+
+
+# The client talks real HTTP to a local fake server, nothing is patched.
+class TestAsyncBestsellerNotifier(SimpleTestCase):
+
+    async def test_notifications_are_posted_to_the_api(self):
+        books = [make_best_seller('Do This', 'Cam McHugh', '+13065551111'),
+                 make_best_seller('Don\'t Do That', 'Brennan Rauert', '+13065552222')]
+
+        with FakeDwilioServer() as server:
+            notifier = AsyncBestsellerNotifier(
+                book_repository=FakeRepository(books),
+                dwilio_client=AsyncDwilioClient(base_url=server.base_url),
+            )
+            results = await notifier.notify_current_best_sellers()
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual({'+13065551111', '+13065552222'}, {message['to'] for message in server.messages})
+        self.assertIn('Congratulations Cam McHugh', server.messages[0]['body'] + server.messages[1]['body'])
+
+    async def test_api_errors_are_reported_per_notification(self):
+        books = [make_best_seller('Do This', 'Cam McHugh', '+13065551111')]
+
+        with FakeDwilioServer(status_code=500) as server:
+            notifier = AsyncBestsellerNotifier(
+                book_repository=FakeRepository(books),
+                dwilio_client=AsyncDwilioClient(base_url=server.base_url),
+            )
+            results = await notifier.notify_current_best_sellers()
+
+        self.assertFalse(results[0].success)
+        self.assertIsInstance(results[0].error, DwilioApiException)
+
+    async def test_connections_are_reused(self):
+        books = [make_best_seller(f'Book {i}', 'Cam McHugh', str(i)) for i in range(20)]
+
+        with FakeDwilioServer() as server:
+            client = AsyncDwilioClient(base_url=server.base_url, transport=PooledHttpTransport(), max_in_flight=4)
+            notifier = AsyncBestsellerNotifier(book_repository=FakeRepository(books), dwilio_client=client)
+            results = await notifier.notify_current_best_sellers()
+            client.close()
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(20, len(server.messages))
+        self.assertLessEqual(len(server.connections), 4)
+
+    async def test_sends_go_through_the_rate_limiter(self):
+        books = [make_best_seller(f'Book {i}', 'Cam McHugh', str(i)) for i in range(10)]
+        clock = []
+
+        class RecordingTokenBucket(TokenBucket):
+            def acquire(self, tokens=1):
+                clock.append(tokens)
+                return super().acquire(tokens)
+
+        with FakeDwilioServer() as server:
+            client = AsyncDwilioClient(base_url=server.base_url, transport=PooledHttpTransport(),
+                                       rate_limiter=RecordingTokenBucket(1000))
+            await AsyncBestsellerNotifier(book_repository=FakeRepository(books), dwilio_client=client).\
+                notify_current_best_sellers()
+            client.close()
+
+        self.assertEqual(10, len(clock))
+
+    async def test_sends_in_flight_are_cancelled_when_reading_fails(self):
+        books = [make_best_seller(f'Book {i}', 'Cam McHugh', str(i)) for i in range(3)]
+        client = HangingAsyncDwilioClient()
+        notifier = AsyncBestsellerNotifier(book_repository=FailingRepository(books), dwilio_client=client)
+
+        with self.assertRaises(RuntimeError):
+            await notifier.notify_current_best_sellers()
+
+        self.assertEqual(3, client.started)
+        self.assertEqual(3, client.cancelled)
+
+    async def test_in_flight_sends_are_bounded(self):
+        books = [make_best_seller(f'Book {i}', 'Cam McHugh', str(i)) for i in range(50)]
+        client = SlowAsyncDwilioClient()
+        notifier = AsyncBestsellerNotifier(book_repository=FakeRepository(books), dwilio_client=client, max_in_flight=5)
+
+        results = await notifier.notify_current_best_sellers()
+
+        self.assertEqual(50, len(results))
+        self.assertEqual(5, client.max_seen_in_flight)
+
+    async def test_in_flight_sends_are_bounded_by_the_client_by_default(self):
+        books = [make_best_seller(f'Book {i}', 'Cam McHugh', str(i)) for i in range(50)]
+        client = SlowAsyncDwilioClient()
+        client.max_in_flight = 3
+
+        await AsyncBestsellerNotifier(book_repository=FakeRepository(books), dwilio_client=client).\
+            notify_current_best_sellers()
+
+        self.assertEqual(3, client.max_seen_in_flight)
+
+    def test_notifiers_share_the_default_client(self):
+        first, second = AsyncBestsellerNotifier(), AsyncBestsellerNotifier()
+
+        self.assertIs(default_async_client(), first.dwilio_client)
+        self.assertIs(first.dwilio_client, second.dwilio_client)
+        self.assertEqual(first.dwilio_client.max_in_flight, first.max_in_flight)
+
+
+class TestAsyncBestsellerNotifierUsingDB(TestCase):
+
+    async def test_best_sellers_are_read_with_the_async_orm(self):
+        def setup():
+            cam = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+            BookSold.objects.create(book=Book.objects.create(title='Do This', author=cam), price=10, date=date.today())
+        await sync_to_async(setup)()
+        client = SlowAsyncDwilioClient()
+
+        await AsyncBestsellerNotifier(dwilio_client=client).notify_current_best_sellers()
+
+        self.assertEqual(['+13065551111'], client.sent)
@@ -0,0 +1,77 @@
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from ..dwilio import DwilioClient
+from ..notifiers import BestsellerNotifierVersion4
+from ..repository import BookRepository
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import RecordingDwilioClient
+
+
+# Logs rows as they're read and batches as they're sent, to show the two interleave.
+class EventLog(object):
+
+    def __init__(self):
+        self.events = []
+
+
+class LoggingBookRepository(BookRepository):
+
+    def __init__(self, log, **kwargs):
+        super().__init__(**kwargs)
+        self.log = log
+
+    def best_seller_notifications_last_week(self):
+        for notification in super().best_seller_notifications_last_week():
+            self.log.events.append('row')
+            yield notification
+
+
+class LoggingDwilioClient(DwilioClient):
+
+    def __init__(self, log):
+        super().__init__(batch_size=2, max_in_flight=1)
+        self.log = log
+
+    def _send_batch_to_api(self, payloads):
+        self.log.events.append('send')
+
+
+class TestStreamingBestSellers(TestCase):
+
+    def setUp(self):
+        create_best_sellers(5)
+
+    def test_streaming_returns_an_iterator_not_a_queryset(self):
+        best_sellers = BookRepository(stream=True, chunk_size=2).best_sellers_last_week()
+
+        self.assertNotIsInstance(best_sellers, QuerySet)
+        books = list(best_sellers)
+        self.assertEqual(5, len(books))
+        self.assertEqual({10}, {book.total_sales for book in books})
+
+    def test_notifier_sends_streamed_best_sellers(self):
+        client = RecordingDwilioClient()
+        notifier = BestsellerNotifierVersion4(
+            book_repository=BookRepository(stream=True, chunk_size=2),
+            dwilio_client=client,
+        )
+
+        notifier.notify_current_best_sellers()
+
+        self.assertEqual(5, len(client.sent))
+        self.assertIn(('+13065550000', 'Congratulations Author 0, your book Book 0 sold 1 $10 this week'), client.sent)
+
+    def test_sending_starts_before_the_query_is_exhausted(self):
+        log = EventLog()
+        notifier = BestsellerNotifierVersion4(
+            book_repository=LoggingBookRepository(log, stream=True, chunk_size=2),
+            dwilio_client=LoggingDwilioClient(log),
+            rows=True,
+        )
+
+        notifier.notify_current_best_sellers()
+
+        self.assertEqual(5, log.events.count('row'))
+        last_row = len(log.events) - 1 - log.events[::-1].index('row')
+        self.assertLess(log.events.index('send'), last_row)
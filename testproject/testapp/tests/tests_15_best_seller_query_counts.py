@@ -0,0 +1,34 @@
+from django.test import TestCase
+from unittest.mock import patch
+
+from ..notifiers import BestsellerNotifierVersion1, \
+    BestsellerNotifierVersion2, \
+    BestsellerNotifierVersion3, \
+    BestsellerNotifierVersion4
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import RecordingDwilioClient
+
+
+# Rendering a notification reads book.author, which must not cost a query per book.
+@patch('testapp.notifiers.DwilioClient', new=RecordingDwilioClient)
+class TestBestSellerNotifiersQueryCount(TestCase):
+
+    def assertConstantQueries(self, notifier_class):
+        create_best_sellers(2)
+        with self.assertNumQueries(1):
+            notifier_class().notify_current_best_sellers()
+        create_best_sellers(20)
+        with self.assertNumQueries(1):
+            notifier_class().notify_current_best_sellers()
+
+    def test_version1_query_count_is_constant(self):
+        self.assertConstantQueries(BestsellerNotifierVersion1)
+
+    def test_version2_query_count_is_constant(self):
+        self.assertConstantQueries(BestsellerNotifierVersion2)
+
+    def test_version3_query_count_is_constant(self):
+        self.assertConstantQueries(BestsellerNotifierVersion3)
+
+    def test_version4_query_count_is_constant(self):
+        self.assertConstantQueries(BestsellerNotifierVersion4)
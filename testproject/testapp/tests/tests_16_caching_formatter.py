@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..caching_formatter import CachingStringFormatter, DjangoFormatterCache, LocalFormatterCache
+from ..pay_per_use_formatter import PayPerUseStringFormatter
+from ..slow_formatter import SlowStringFormatter
+
+
+class CountingFormatter(SlowStringFormatter):
+    calls = 0
+
+    def _this_is_the_slow_part(self):
+        self.calls += 1
+
+
+class FakeBillingSystem(object):
+
+    def charge_for_usage(self, debit):
+        return {
+            'status_code': 200,
+            'response': {'success': True, 'new_balance': 50}
+        }
+
+
+class FakeClock(object):
+    now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCachingStringFormatter(SimpleTestCase):
+
+    def test_repeated_calls_only_format_once(self):
+        slow_formatter = CountingFormatter()
+        formatter = PayPerUseStringFormatter(
+            formatter=CachingStringFormatter(slow_formatter),
+            billing_system=FakeBillingSystem(),
+        )
+
+        first = formatter.concatenate('string1', 'string2', 'string3')
+        second = formatter.concatenate('string1', 'string2', 'string4')
+
+        self.assertEqual((50, 'string1 string2 string3'), first)
+        self.assertEqual((50, 'string1 string2 string4'), second)
+        self.assertEqual(1, slow_formatter.calls)
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0}, formatter.formatter.stats())
+
+    def test_least_recently_used_entry_is_evicted(self):
+        slow_formatter = CountingFormatter()
+        formatter = CachingStringFormatter(slow_formatter, LocalFormatterCache(max_entries=2))
+
+        formatter.really_slow_string_format('a', 'b')
+        formatter.really_slow_string_format('c', 'd')
+        formatter.really_slow_string_format('a', 'b')
+        formatter.really_slow_string_format('e', 'f')  # evicts c d
+        formatter.really_slow_string_format('a', 'b')
+        formatter.really_slow_string_format('c', 'd')
+
+        self.assertEqual(4, slow_formatter.calls)
+        self.assertEqual({'hits': 2, 'misses': 4, 'evictions': 2}, formatter.stats())
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        slow_formatter = CountingFormatter()
+        formatter = CachingStringFormatter(slow_formatter, LocalFormatterCache(ttl=60, clock=clock))
+
+        formatter.really_slow_string_format('a', 'b')
+        clock.now = 59
+        formatter.really_slow_string_format('a', 'b')
+        clock.now = 60
+        formatter.really_slow_string_format('a', 'b')
+
+        self.assertEqual(2, slow_formatter.calls)
+        self.assertEqual(1, formatter.stats()['evictions'])
+
+    def test_django_cache_backend(self):
+        self.addCleanup(cache.clear)
+        slow_formatter = CountingFormatter()
+        formatter = CachingStringFormatter(slow_formatter, DjangoFormatterCache())
+
+        formatter.really_slow_string_format('a b', 'c')
+        # a new formatter sharing the same Django cache doesn't have to recompute.
+        result = CachingStringFormatter(slow_formatter, DjangoFormatterCache()).really_slow_string_format('a b', 'c')
+
+        self.assertEqual('a b c', result)
+        self.assertEqual(1, slow_formatter.calls)
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep
+from django.test import SimpleTestCase
+
+from ..single_flight import SingleFlightStringFormatter
+from ..slow_formatter import SlowStringFormatter
+
+
+# Blocks in the slow part until released, so the test controls when the in-flight call finishes.
+class BlockingFormatter(SlowStringFormatter):
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.started = Event()
+        self.release = Event()
+
+    def _this_is_the_slow_part(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+
+
+class TestSingleFlightStringFormatter(SimpleTestCase):
+
+    def run_concurrently(self, formatter, count, *args):
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(formatter.really_slow_string_format, *args)]
+            formatter.formatter.started.wait(5)
+            futures += [executor.submit(formatter.really_slow_string_format, *args) for _ in range(count - 1)]
+            sleep(0.1)  # give the other callers time to join the in-flight call
+            formatter.formatter.release.set()
+            return futures
+
+    def test_concurrent_identical_calls_share_one_computation(self):
+        slow_formatter = BlockingFormatter()
+        formatter = SingleFlightStringFormatter(slow_formatter)
+
+        futures = self.run_concurrently(formatter, 10, 'a', 'b')
+
+        self.assertEqual(['a b'] * 10, [future.result() for future in futures])
+        self.assertEqual(1, slow_formatter.calls)
+
+    def test_errors_are_raised_in_every_waiting_caller(self):
+        formatter = SingleFlightStringFormatter(BlockingFormatter(error=ValueError('nope')))
+
+        futures = self.run_concurrently(formatter, 5, 'a', 'b')
+
+        for future in futures:
+            self.assertRaises(ValueError, future.result)
+
+    def test_calls_after_completion_compute_again(self):
+        slow_formatter = BlockingFormatter()
+        slow_formatter.release.set()
+        formatter = SingleFlightStringFormatter(slow_formatter)
+
+        formatter.really_slow_string_format('a', 'b')
+        formatter.really_slow_string_format('a', 'b')
+
+        self.assertEqual(2, slow_formatter.calls)
+
+    def test_waiting_callers_time_out(self):
+        slow_formatter = BlockingFormatter()
+        formatter = SingleFlightStringFormatter(slow_formatter, timeout=0.01)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(formatter.really_slow_string_format, 'a', 'b')
+            slow_formatter.started.wait(5)
+            follower = executor.submit(formatter.really_slow_string_format, 'a', 'b')
+            self.assertRaises(TimeoutError, follower.result)
+            slow_formatter.release.set()
+
+        self.assertEqual('a b', leader.result())
@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from threading import Event
+from django.test import SimpleTestCase
+
+from ..billing import AccountDebit, AggregatingBillingSystem, BillingSystem, BillingSystemException
+from ..pay_per_use_formatter import PayPerUseStringFormatter
+from ..slow_formatter import SlowStringFormatter
+from ..transport import TransportException
+
+
+# Fakes the HTTP call only, so the request/response shaping in BillingSystem is exercised.
+class FakeBillingTransport(object):
+
+    def __init__(self, balances, status_code=200):
+        self.balances = dict(balances)
+        self.status_code = status_code
+        self.requests = []
+
+    def post_json(self, url, post_body):
+        self.requests.append((url, post_body))
+        if self.status_code != 200:
+            return {'status_code': self.status_code, 'response': {'success': False}}
+        results = []
+        for debit in post_body['debits']:
+            self.balances[debit['account_id']] -= debit['amount']
+            results.append({'success': True, 'new_balance': self.balances[debit['account_id']]})
+        return {'status_code': 200, 'response': {'results': results}}
+
+
+class UnreachableTransport(object):
+
+    def post_json(self, url, post_body):
+        raise TransportException('No billing allowed during tests')
+
+
+class FixedResponseTransport(object):
+
+    def __init__(self, response):
+        self.response = response
+
+    def post_json(self, url, post_body):
+        return {'status_code': 200, 'response': self.response}
+
+
+class HangingTransport(object):
+
+    def __init__(self):
+        self.released = Event()
+
+    def post_json(self, url, post_body):
+        self.released.wait(10)
+        return {'status_code': 200, 'response': {'results': [{'success': True, 'new_balance': 0}]}}
+
+
+class FakeFormatter(SlowStringFormatter):
+
+    def _this_is_the_slow_part(self):
+        pass
+
+
+class TestChargeForUsageBatch(SimpleTestCase):
+
+    def test_many_debits_are_charged_in_one_request(self):
+        transport = FakeBillingTransport({'AC1': 1000, 'AC2': 500})
+        billing_system = BillingSystem(transport=transport)
+
+        results = billing_system.charge_for_usage_batch([AccountDebit('AC1', 100), AccountDebit('AC2', 50)])
+
+        self.assertEqual(1, len(transport.requests))
+        self.assertEqual([900, 450], [result['response']['new_balance'] for result in results])
+        self.assertEqual([200, 200], [result['status_code'] for result in results])
+
+    def test_failed_batch_fails_every_debit(self):
+        transport = FakeBillingTransport({'AC1': 1000}, status_code=402)
+        billing_system = BillingSystem(transport=transport)
+
+        results = billing_system.charge_for_usage_batch([AccountDebit('AC1', 100), AccountDebit('AC1', 50)])
+
+        self.assertEqual([402, 402], [result['status_code'] for result in results])
+
+
+class TestAggregatingBillingSystem(SimpleTestCase):
+
+    def test_concurrent_debits_are_merged_per_account(self):
+        transport = FakeBillingTransport({'AC1': 1000, 'AC2': 1000})
+        billing_system = BillingSystem(transport=transport)
+        aggregator = AggregatingBillingSystem(billing_system, window=0.1)
+        debits = [AccountDebit('AC1', 100), AccountDebit('AC2', 10), AccountDebit('AC1', 100), AccountDebit('AC1', 100)]
+
+        with ThreadPoolExecutor(max_workers=len(debits)) as executor:
+            results = list(executor.map(aggregator.charge_for_usage, debits))
+
+        self.assertEqual(1, len(transport.requests))
+        self.assertEqual(
+            [{'account_id': 'AC1', 'amount': 300}, {'account_id': 'AC2', 'amount': 10}],
+            sorted(transport.requests[0][1]['debits'], key=lambda debit: debit['account_id'])
+        )
+        # every caller sees a distinct balance, as if their debits had been charged one at a time.
+        ac1_balances = sorted(result['response']['new_balance'] for debit, result in zip(debits, results)
+                              if debit.account_id == 'AC1')
+        self.assertEqual([700, 800, 900], ac1_balances)
+        self.assertEqual(700, transport.balances['AC1'])
+
+    def test_batch_is_settled_early_when_full(self):
+        transport = FakeBillingTransport({'AC1': 1000})
+        billing_system = BillingSystem(transport=transport)
+        aggregator = AggregatingBillingSystem(billing_system, window=60, max_batch_size=1)
+
+        result = aggregator.charge_for_usage(AccountDebit('AC1', 100))
+
+        self.assertEqual(900, result['response']['new_balance'])
+
+    def test_billing_api_errors_are_raised_in_every_caller(self):
+        billing_system = BillingSystem(transport=UnreachableTransport())
+        aggregator = AggregatingBillingSystem(billing_system, window=0.01)
+
+        self.assertRaisesMessage(TransportException, 'No billing allowed during tests',
+                                 aggregator.charge_for_usage, AccountDebit('AC1', 100))
+
+    def test_too_few_results_fail_every_caller(self):
+        transport = FixedResponseTransport({'results': [{'success': True, 'new_balance': 1}]})
+        billing_system = BillingSystem(transport=transport)
+        aggregator = AggregatingBillingSystem(billing_system, window=0.05)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(aggregator.charge_for_usage, AccountDebit(account_id, 100))
+                       for account_id in ('AC1', 'AC2')]
+
+        for future in futures:
+            self.assertRaisesMessage(BillingSystemException, '1 results for 2 debits', future.result)
+
+    def test_result_without_a_balance_fails_the_caller(self):
+        billing_system = BillingSystem(transport=FixedResponseTransport({'results': [{'success': True}]}))
+        aggregator = AggregatingBillingSystem(billing_system, window=0.01)
+
+        self.assertRaisesMessage(BillingSystemException, 'no new balance',
+                                 aggregator.charge_for_usage, AccountDebit('AC1', 100))
+
+    def test_callers_stop_waiting_after_the_timeout(self):
+        transport = HangingTransport()
+        aggregator = AggregatingBillingSystem(BillingSystem(transport=transport), window=0.01, timeout=0.05)
+
+        try:
+            self.assertRaises(TimeoutError, aggregator.charge_for_usage, AccountDebit('AC1', 100))
+        finally:
+            transport.released.set()
+
+    def test_drop_in_for_pay_per_use_formatter(self):
+        transport = FakeBillingTransport({'AC123': 150})
+        billing_system = BillingSystem(transport=transport)
+        formatter = PayPerUseStringFormatter(
+            formatter=FakeFormatter(),
+            billing_system=AggregatingBillingSystem(billing_system, window=0.01),
+        )
+
+        self.assertEqual((50, 'a b c'), formatter.concatenate('a', 'b', 'c'))
@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+from django.test import SimpleTestCase
+
+from ..billing import AccountDebit, BillingSystem
+from ..dwilio import DwilioClient, DwilioApiException
+from ..transport import PooledHttpTransport, TransportException, retry_after
+from .fake_dwilio_server import FakeDwilioServer
+
+
+class FlakyServer(FakeDwilioServer):
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def respond(self, message):
+        if self.failures:
+            self.failures -= 1
+            return 503, None
+        return super().respond(message)
+
+
+# Reuses idle connections without checking them, as if the server always hung up just after the check.
+class UncheckedPooledHttpTransport(PooledHttpTransport):
+
+    def _is_open(self, connection):
+        return True
+
+
+class TestPooledHttpTransport(SimpleTestCase):
+
+    def test_connections_are_reused_between_requests(self):
+        transport = PooledHttpTransport()
+
+        with FakeDwilioServer() as server:
+            client = DwilioClient(transport=transport, base_url=server.base_url)
+            for i in range(5):
+                client._send_to_api(str(i), 'hello')
+
+        self.assertEqual(5, len(server.messages))
+        self.assertEqual(1, len(server.connections))
+
+    def test_clients_share_the_transport_pool(self):
+        transport = PooledHttpTransport()
+
+        with FakeDwilioServer(status_code=200, response_body={'success': True, 'new_balance': 50}) as server:
+            DwilioClient(transport=transport, base_url=server.base_url)._send_to_api('1', 'hello')
+            result = BillingSystem(transport=transport, base_url=server.base_url).charge_for_usage(
+                AccountDebit('AC123', 100)
+            )
+
+        self.assertEqual((200, {'success': True, 'new_balance': 50}), (result['status_code'], result['response']))
+        self.assertEqual({'account_id': 'AC123', 'amount': 100}, server.messages[1])
+        self.assertEqual(1, len(server.connections))
+
+    def test_connections_per_host_are_bounded(self):
+        transport = PooledHttpTransport(max_connections_per_host=2)
+
+        with FakeDwilioServer() as server:
+            client = DwilioClient(transport=transport, base_url=server.base_url)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda i: client._send_to_api(str(i), 'hello'), range(40)))
+
+        self.assertEqual(40, len(server.messages))
+        self.assertLessEqual(len(server.connections), 2)
+
+    def test_connections_closed_while_idle_are_not_reused(self):
+        transport = PooledHttpTransport(retries=0)
+
+        with FakeDwilioServer(status_code=200, idle_timeout=0.05) as server:
+            billing = BillingSystem(transport=transport, base_url=server.base_url)
+            billing.charge_for_usage(AccountDebit('AC123', 100))
+            sleep(0.2)
+            result = billing.charge_for_usage(AccountDebit('AC123', 100))
+
+        self.assertEqual(200, result['status_code'])
+        self.assertEqual(2, len(server.messages))
+        self.assertEqual(2, len(server.connections))
+
+    def test_requests_on_a_reused_connection_the_server_closed_are_sent_again_once(self):
+        transport = UncheckedPooledHttpTransport(retries=0)
+
+        with FakeDwilioServer(status_code=200, idle_timeout=0.05) as server:
+            billing = BillingSystem(transport=transport, base_url=server.base_url)
+            billing.charge_for_usage(AccountDebit('AC123', 100))
+            sleep(0.2)
+            result = billing.charge_for_usage(AccountDebit('AC123', 100))
+
+        # no idempotency key and no retries, but the server never saw the first attempt.
+        self.assertEqual(200, result['status_code'])
+        self.assertEqual([('/billing', None)] * 2, server.requests)
+        self.assertEqual(2, len(server.connections))
+
+    def test_retryable_statuses_are_retried_with_jittered_backoff(self):
+        sleeps = []
+        transport = PooledHttpTransport(retries=2, backoff=0.1, sleep=sleeps.append, random=lambda: 0.5)
+
+        with FlakyServer(failures=2) as server:
+            DwilioClient(transport=transport, base_url=server.base_url)._send_to_api('1', 'hello')
+
+        self.assertEqual(3, len(server.messages))
+        self.assertEqual([0.05, 0.1], sleeps)
+        # every attempt is recognisably the same request.
+        self.assertEqual(1, len({key for _, key in server.requests}))
+        self.assertIsNotNone(server.requests[0][1])
+
+    def test_requests_without_an_idempotency_key_are_not_retried_once_sent(self):
+        transport = PooledHttpTransport(retries=2, sleep=lambda seconds: None)
+
+        with FlakyServer(failures=1) as server:
+            result = BillingSystem(transport=transport, base_url=server.base_url).charge_for_usage(
+                AccountDebit('AC123', 100)
+            )
+
+        self.assertEqual(503, result['status_code'])
+        self.assertEqual([('/billing', None)], server.requests)
+
+    def test_retry_after_is_honoured(self):
+        sleeps = []
+        transport = PooledHttpTransport(retries=1, backoff=0.1, retry_statuses=(429,), sleep=sleeps.append,
+                                        random=lambda: 0.5)
+
+        with FakeDwilioServer(status_code=429, retry_after=3) as server:
+            result = transport.post_json(f'{server.base_url}/messages', {}, idempotency_key='key')
+
+        self.assertEqual('3', result['headers']['retry-after'])
+        self.assertEqual([3.0], sleeps)
+
+    def test_retry_after_dates_and_nonsense(self):
+        self.assertIsNone(retry_after({}))
+        self.assertIsNone(retry_after({'retry-after': 'soon'}))
+        self.assertEqual(0.0, retry_after({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'}))
+        self.assertEqual(1.5, retry_after({'retry-after': '1.5'}))
+
+    def test_query_string_is_kept(self):
+        transport = PooledHttpTransport()
+
+        with FakeDwilioServer() as server:
+            transport.post_json(f'{server.base_url}/messages?async=true', {})
+
+        self.assertEqual('/messages?async=true', server.requests[0][0])
+
+    def test_gives_up_after_retries(self):
+        transport = PooledHttpTransport(retries=1, sleep=lambda seconds: None)
+
+        with FlakyServer(failures=5) as server:
+            client = DwilioClient(transport=transport, base_url=server.base_url)
+            self.assertRaises(DwilioApiException, client._send_to_api, '1', 'hello')
+
+        self.assertEqual(2, len(server.messages))
+
+    def test_connection_errors_raise_transport_exception(self):
+        sleeps = []
+        transport = PooledHttpTransport(retries=1, timeout=1, sleep=sleeps.append)
+
+        with FakeDwilioServer() as server:
+            base_url = server.base_url
+
+        self.assertRaises(TransportException, transport.post_json, f'{base_url}/messages', {})
+        # nothing was sent, so it was safe to try again even without an idempotency key.
+        self.assertEqual(1, len(sleeps))
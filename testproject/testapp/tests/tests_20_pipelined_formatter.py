@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import monotonic, sleep
+from django.test import SimpleTestCase
+
+from ..billing import AccountDebit, BillingSystemException
+from ..pay_per_use_formatter import PayPerUseStringFormatter
+from ..slow_formatter import SlowStringFormatter
+
+
+class SlowBillingSystem(object):
+
+    def __init__(self, status_code=200, delay=0.2):
+        self.status_code = status_code
+        self.delay = delay
+        self.debits = []
+
+    def charge_for_usage(self, debit):
+        self.debits.append(debit)
+        sleep(self.delay)
+        return {
+            'status_code': self.status_code,
+            'response': {'success': self.status_code == 200, 'new_balance': 50}
+        }
+
+
+class ShorterSlowFormatter(SlowStringFormatter):
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.started = Event()
+
+    def _this_is_the_slow_part(self):
+        self.started.set()
+        sleep(self.delay)
+
+
+class TestPipelinedConcatenate(SimpleTestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_billing_and_formatting_overlap(self):
+        billing_system = SlowBillingSystem()
+        formatter = PayPerUseStringFormatter(
+            formatter=ShorterSlowFormatter(),
+            billing_system=billing_system,
+            executor=self.executor,
+        )
+
+        start = monotonic()
+        result = formatter.concatenate('string1', 'string2', 'string3')
+        elapsed = monotonic() - start
+
+        self.assertEqual((50, 'string1 string2 string3'), result)
+        self.assertEqual([AccountDebit('AC123', 100)], billing_system.debits)
+        self.assertLess(elapsed, 0.35)  # sequentially it's 0.4
+
+    def test_failed_billing_still_raises_billing_system_exception(self):
+        formatter = PayPerUseStringFormatter(
+            formatter=ShorterSlowFormatter(),
+            billing_system=SlowBillingSystem(status_code=500, delay=0),
+            executor=self.executor,
+        )
+
+        self.assertRaises(BillingSystemException, formatter.concatenate, 'string1', 'string2', 'string3')
+
+    def test_queued_formatting_is_cancelled_when_billing_fails(self):
+        busy = ShorterSlowFormatter(delay=0.1)
+        self.executor.submit(busy.really_slow_string_format, 'keep', 'busy')
+        busy.started.wait(1)
+        slow_formatter = ShorterSlowFormatter()
+        formatter = PayPerUseStringFormatter(
+            formatter=slow_formatter,
+            billing_system=SlowBillingSystem(status_code=402, delay=0),
+            executor=self.executor,
+        )
+
+        self.assertRaises(BillingSystemException, formatter.concatenate, 'string1', 'string2', 'string3')
+        self.executor.shutdown(wait=True)
+        self.assertFalse(slow_formatter.started.is_set())
@@ -0,0 +1,70 @@
+from threading import Event, Thread
+from django.test import SimpleTestCase
+
+from ..formatter_executors import InlineFormatterExecutor, ProcessFormatterExecutor, ThreadFormatterExecutor
+from ..pay_per_use_formatter import PayPerUseStringFormatter
+from ..slow_formatter import SlowStringFormatter
+
+
+# Module level, so it can be pickled over to a worker process.
+class FastFormatter(SlowStringFormatter):
+
+    def _this_is_the_slow_part(self):
+        pass
+
+
+class FakeBillingSystem(object):
+
+    def charge_for_usage(self, debit):
+        return {
+            'status_code': 200,
+            'response': {'success': True, 'new_balance': 50}
+        }
+
+
+class TestFormatterExecutors(SimpleTestCase):
+
+    def concatenate_with(self, executor):
+        formatter = PayPerUseStringFormatter(
+            formatter=FastFormatter(),
+            billing_system=FakeBillingSystem(),
+            executor=executor,
+        )
+        return formatter.concatenate('string1', 'string2', 'string3')
+
+    def test_inline_executor(self):
+        self.assertEqual((50, 'string1 string2 string3'), self.concatenate_with(InlineFormatterExecutor()))
+
+    def test_thread_executor(self):
+        executor = ThreadFormatterExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+
+        self.assertEqual((50, 'string1 string2 string3'), self.concatenate_with(executor))
+
+    def test_process_executor(self):
+        executor = ProcessFormatterExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        executor.warm_up()
+
+        self.assertEqual((50, 'string1 string2 string3'), self.concatenate_with(executor))
+
+    def test_inline_executor_returns_errors_in_the_future(self):
+        future = InlineFormatterExecutor().submit(int, 'not a number')
+
+        self.assertRaises(ValueError, future.result)
+
+    def test_submit_blocks_when_the_queue_is_full(self):
+        executor = ThreadFormatterExecutor(max_workers=1, max_queued=1)
+        self.addCleanup(executor.shutdown)
+        release = Event()
+        executor.submit(release.wait, 5)
+        executor.submit(release.wait, 5)
+        third_submitted = Event()
+
+        submitter = Thread(target=lambda: (executor.submit(release.wait, 5), third_submitted.set()))
+        submitter.start()
+
+        self.assertFalse(third_submitted.wait(0.1))
+        release.set()
+        self.assertTrue(third_submitted.wait(5))
+        submitter.join()
@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Author, Book, BookSold, LeaderboardWindow, WeeklyBookSales
+from ..repository import BookRepository
+
+
+class TestBestSellerLeaderboard(TestCase):
+
+    def setUp(self):
+        self.today = date.today()
+        WeeklyBookSales.objects.rebuild(self.today)
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        self.books = [Book.objects.create(title=f'Book {i}', author=author) for i in range(3)]
+
+    def sell(self, book, price, days_ago=0):
+        return BookSold.objects.create(book=book, price=price, date=self.today - timedelta(days=days_ago))
+
+    def test_sales_are_added_as_they_are_saved(self):
+        self.sell(self.books[0], 10)
+        self.sell(self.books[0], 8, days_ago=3)
+        self.sell(self.books[1], 5)
+
+        with self.assertNumQueries(1):
+            top = list(BookRepository().top_sellers_last_week(2))
+
+        self.assertEqual([self.books[0], self.books[1]], top)
+        self.assertEqual((18, 2), (top[0].total_sales, top[0].total_sold))
+
+    def test_edits_and_deletes_are_applied(self):
+        sale = self.sell(self.books[0], 10)
+        self.sell(self.books[1], 5)
+        sale.price = 4
+        sale.save()
+        BookSold.objects.get(book=self.books[1]).delete()
+
+        self.assertEqual(
+            [(self.books[0].pk, 4, 1)],
+            list(WeeklyBookSales.objects.values_list('book_id', 'total_sales', 'total_sold'))
+        )
+
+    def test_reading_does_not_advance_the_window(self):
+        start = LeaderboardWindow.objects.get().start_date
+        LeaderboardWindow.objects.update(start_date=start - timedelta(days=3))
+
+        with self.assertNumQueries(1):
+            list(BookRepository(leaderboard=True).best_sellers_last_week())
+
+        self.assertEqual(start - timedelta(days=3), LeaderboardWindow.objects.get().start_date)
+
+    def test_advance_command(self):
+        self.sell(self.books[0], 10, days_ago=3)
+        LeaderboardWindow.objects.update(start_date=self.today - timedelta(days=10))
+
+        call_command('advance_leaderboard', stdout=StringIO())
+
+        self.assertEqual(self.today - timedelta(days=7), LeaderboardWindow.objects.get().start_date)
+        self.assertEqual(10, WeeklyBookSales.objects.get(book=self.books[0]).total_sales)
+
+    def test_sales_older_than_the_window_are_ignored(self):
+        self.sell(self.books[0], 10, days_ago=8)
+
+        self.assertFalse(WeeklyBookSales.objects.exists())
+
+    def test_days_falling_out_of_the_window_are_expired(self):
+        self.sell(self.books[0], 10, days_ago=7)
+        self.sell(self.books[0], 8)
+        self.sell(self.books[1], 5, days_ago=7)
+
+        WeeklyBookSales.objects.advance(self.today + timedelta(days=1))
+
+        self.assertEqual(
+            [(self.books[0].pk, 8, 1)],
+            list(WeeklyBookSales.objects.values_list('book_id', 'total_sales', 'total_sold'))
+        )
+        self.assertEqual(self.today - timedelta(days=6), LeaderboardWindow.objects.get().start_date)
+
+    def test_leaderboard_matches_the_rollup(self):
+        for i, days_ago in enumerate([0, 1, 6, 7, 8, 14]):
+            self.sell(self.books[i % 3], 10 + i, days_ago=days_ago)
+        WeeklyBookSales.objects.advance(self.today + timedelta(days=2))
+        since = self.today + timedelta(days=2) - timedelta(days=7)
+
+        expected = {book.pk: (book.total_sales, book.total_sold) for book in Book.objects.bestsellers(since=since)}
+        actual = {pk: (sales, sold) for pk, sales, sold in
+                  WeeklyBookSales.objects.values_list('book_id', 'total_sales', 'total_sold')}
+
+        self.assertEqual(expected, actual)
+
+    def test_repository_reads_the_leaderboard(self):
+        self.sell(self.books[2], 10)
+
+        best_sellers = list(BookRepository(leaderboard=True).best_sellers_last_week())
+
+        self.assertEqual([self.books[2]], best_sellers)
+
+    def test_rebuild_command(self):
+        self.sell(self.books[0], 10)
+        WeeklyBookSales.objects.all().delete()
+
+        call_command('advance_leaderboard', '--rebuild', stdout=StringIO())
+
+        self.assertEqual(10, WeeklyBookSales.objects.get(book=self.books[0]).total_sales)
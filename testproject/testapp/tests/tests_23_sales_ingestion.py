@@ -0,0 +1,97 @@
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Author, Book, BookSold, DailyBookSales, WeeklyBookSales
+
+
+class TestSalesIngestion(TestCase):
+
+    def setUp(self):
+        self.today = date.today()
+        WeeklyBookSales.objects.rebuild(self.today)
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        self.book = Book.objects.create(title='Do This', author=author)
+        self.old_date = self.today - timedelta(days=14)
+
+    def csv_export(self):
+        return StringIO(
+            'book_id,price,date\n'
+            f'{self.book.pk},10,{self.today}\n'
+            f'{self.book.pk},8,{self.today}\n'
+            f'{self.book.pk},5,{self.old_date}\n'
+        )
+
+    def test_csv_sales_are_ingested_with_their_aggregates(self):
+        report = BookSold.objects.ingest(self.csv_export(), chunk_size=2)
+
+        self.assertEqual(3, report.rows)
+        self.assertEqual(3, BookSold.objects.count())
+        self.assertEqual(
+            {(self.today, 18, 2), (self.old_date, 5, 1)},
+            set(DailyBookSales.objects.values_list('date', 'total_sales', 'total_sold'))
+        )
+        # the old sale is outside the leaderboard window
+        self.assertEqual((18, 2), WeeklyBookSales.objects.values_list('total_sales', 'total_sold').get())
+
+    def test_json_lines_sales_are_ingested(self):
+        stream = StringIO(
+            f'{{"book_id": {self.book.pk}, "price": 10, "date": "{self.today}"}}\n'
+            '\n'
+            f'{{"book_id": {self.book.pk}, "price": 12, "date": "{self.today}"}}\n'
+        )
+
+        report = BookSold.objects.ingest(stream, file_format='jsonl')
+
+        self.assertEqual(2, report.rows)
+        self.assertEqual(22, DailyBookSales.objects.get().total_sales)
+
+    def test_rollups_are_upserted_once_per_chunk(self):
+        other = Book.objects.create(title='Don\'t Do That', author=self.book.author)
+        BookSold.objects.create(book=self.book, price=1, date=self.today)
+        stream = StringIO(
+            'book_id,price,date\n'
+            f'{self.book.pk},10,{self.today}\n'
+            f'{other.pk},8,{self.today}\n'
+            f'{other.pk},5,{self.old_date}\n'
+        )
+
+        # the insert, the window read and one upsert for each rollup, inside a savepoint (two more).
+        with self.assertNumQueries(6):
+            BookSold.objects.ingest(stream, use_copy=False)
+
+        self.assertEqual(
+            {(self.book.pk, self.today, 11, 2), (other.pk, self.today, 8, 1), (other.pk, self.old_date, 5, 1)},
+            set(DailyBookSales.objects.values_list('book_id', 'date', 'total_sales', 'total_sold'))
+        )
+        self.assertEqual(
+            {(self.book.pk, 11, 2), (other.pk, 8, 1)},
+            set(WeeklyBookSales.objects.values_list('book_id', 'total_sales', 'total_sold'))
+        )
+
+    def test_bad_records_are_rejected(self):
+        stream = StringIO('book_id,price,date\n1,ten,2021-03-08\n')
+
+        self.assertRaisesMessage(ValueError, 'Bad sale record 1', BookSold.objects.ingest, stream)
+
+    def test_a_bad_record_leaves_nothing_ingested(self):
+        stream = StringIO(self.csv_export().getvalue() + f'{self.book.pk},ten,{self.today}\n')
+
+        self.assertRaisesMessage(ValueError, 'Bad sale record 4', BookSold.objects.ingest, stream, chunk_size=2)
+
+        # the first chunk went in before the bad record was read, and was rolled back with it.
+        self.assertEqual(0, BookSold.objects.count())
+        self.assertFalse(DailyBookSales.objects.exists())
+        self.assertFalse(WeeklyBookSales.objects.filter(total_sold__gt=0).exists())
+
+    def test_ingest_sales_command_reports_throughput(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as export:
+            export.write(self.csv_export().getvalue())
+            export.flush()
+            stdout = StringIO()
+            call_command('ingest_sales', export.name, '--format', 'csv', '--chunk-size', '2', stdout=stdout)
+
+        self.assertIn('Ingested 3 sales in', stdout.getvalue())
+        self.assertIn('rows/sec', stdout.getvalue())
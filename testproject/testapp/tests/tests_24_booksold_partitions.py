@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+from unittest import skipUnless
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from .. import partitions
+from ..models import Author, Book, BookSold
+
+
+class TestPartitionMonths(SimpleTestCase):
+
+    def test_months_between_crosses_years(self):
+        self.assertEqual(
+            [date(2020, 11, 1), date(2020, 12, 1), date(2021, 1, 1), date(2021, 2, 1)],
+            list(partitions.months_between(date(2020, 11, 15), date(2021, 2, 1)))
+        )
+
+    def test_add_months(self):
+        self.assertEqual(date(2022, 1, 1), partitions.add_months(date(2021, 3, 1), 10))
+        self.assertEqual(date(2019, 3, 1), partitions.add_months(date(2021, 3, 1), -24))
+
+    def test_partition_names(self):
+        self.assertEqual('testapp_booksold_p2021_03', partitions.partition_name(date(2021, 3, 1)))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'BookSold is only partitioned on PostgreSQL')
+class TestBookSoldPartitions(TestCase):
+
+    def test_future_partitions_are_created_once(self):
+        today = date(2040, 1, 10)
+
+        created = BookSold.objects.create_partitions(months_ahead=1, today=today)
+
+        self.assertEqual(['testapp_booksold_p2040_01', 'testapp_booksold_p2040_02'], created)
+        self.assertEqual([], BookSold.objects.create_partitions(months_ahead=1, today=today))
+
+    def test_old_partitions_are_detached(self):
+        BookSold.objects.create_partitions(months_ahead=0, today=date(1990, 1, 1))
+
+        detached = BookSold.objects.detach_partitions(retain_months=1, today=date(1990, 3, 1))
+
+        self.assertEqual(['testapp_booksold_p1990_01'], detached)
+
+    def test_sales_in_the_default_partition_move_to_a_new_partition(self):
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        sale = BookSold.objects.create(book=Book.objects.create(title='Do This', author=author), price=10,
+                                       date=date(2041, 5, 20))
+
+        created = BookSold.objects.create_partitions(months_ahead=0, today=date(2041, 5, 1))
+
+        self.assertEqual(['testapp_booksold_p2041_05'], created)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {partitions.DEFAULT_PARTITION}')
+            self.assertEqual(0, cursor.fetchone()[0])
+            cursor.execute('SELECT id FROM testapp_booksold_p2041_05')
+            self.assertEqual([(sale.pk,)], cursor.fetchall())
+
+    def test_detached_partitions_are_not_recreated(self):
+        BookSold.objects.create_partitions(months_ahead=0, today=date(1991, 1, 1))
+        BookSold.objects.detach_partitions(retain_months=1, today=date(1991, 3, 1))
+
+        self.assertRaisesMessage(partitions.PartitionException, 'testapp_booksold_p1991_01 exists',
+                                 BookSold.objects.create_partitions, months_ahead=0, today=date(1991, 1, 1))
+
+    def test_weekly_query_is_pruned_to_recent_partitions(self):
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        BookSold.objects.create(book=Book.objects.create(title='Do This', author=author), price=10, date=date.today())
+        BookSold.objects.create_partitions(months_ahead=0, today=date.today() - timedelta(days=400))
+
+        plan = BookSold.objects.filter(date__gte=date.today() - timedelta(days=7)).explain()
+
+        self.assertNotIn(partitions.partition_name(date.today() - timedelta(days=400)), plan)
@@ -0,0 +1,24 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from ..benchmarks import targets
+from ..models import BookSold
+
+
+# Smoke test only, at a scale where the numbers mean nothing. Run the command itself for real measurements.
+class TestBenchmarkBestSellers(TransactionTestCase):
+
+    def test_every_target_is_measured_and_the_data_rolled_back(self):
+        stdout = StringIO()
+
+        call_command('benchmark_best_sellers', '--books', '5', '--sales', '50', '--repeat', '1', stdout=stdout)
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual({'books': 5, 'sales': 50, 'days': 60}, report['scale'])
+        self.assertEqual(set(targets()), set(report['results']))
+        for result in report['results'].values():
+            self.assertGreaterEqual(result['queries'], 1)
+            self.assertGreater(result['peak_memory_bytes'], 0)
+        self.assertFalse(BookSold.objects.exists())
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+from random import Random
+from django.test import SimpleTestCase, TestCase
+
+from ..models import Author, Book, BookSold
+from ..notifiers import BestsellerNotifierVersion4
+from ..repository import BookRepository, InMemoryBookRepository
+
+TODAY = date(2021, 3, 15)
+
+
+class FakeDwilioClient(object):
+
+    def __init__(self):
+        self.notifications = []
+
+    def send_notifications(self, notifications):
+        self.notifications.extend(notifications)
+
+
+# The same best seller semantics as the ORM, without a database.
+class TestInMemoryBookRepository(SimpleTestCase):
+
+    def setUp(self):
+        self.repository = InMemoryBookRepository(today=lambda: TODAY)
+        author = Author(name='Cam McHugh', phone_number='+13065551111')
+        self.book1 = Book(title='Do This', author=author)
+        self.book2 = Book(title='Don\'t Do That', author=author)
+
+    def test_only_sales_since_last_week_are_counted(self):
+        self.repository.add_sale(self.book1, 10, TODAY)
+        self.repository.add_sale(self.book1, 8, TODAY - timedelta(days=7))
+        self.repository.add_sale(self.book1, 10, TODAY - timedelta(days=8))
+        self.repository.add_sale(self.book2, 8, TODAY - timedelta(days=14))
+
+        best_sellers = self.repository.best_sellers_last_week()
+
+        self.assertEqual(
+            [('Do This', 18, 2)],
+            [(book.title, book.total_sales, book.total_sold) for book in best_sellers]
+        )
+
+    def test_sales_can_be_added_out_of_order(self):
+        for days_ago, price in [(1, 1), (20, 2), (3, 4), (0, 8), (10, 16)]:
+            self.repository.add_sale(self.book1, price, TODAY - timedelta(days=days_ago))
+
+        best_seller, = self.repository.best_sellers_last_week()
+
+        self.assertEqual((13, 3), (best_seller.total_sales, best_seller.total_sold))
+
+    def test_top_sellers(self):
+        self.repository.add_sale(self.book1, 10, TODAY)
+        self.repository.add_sale(self.book2, 30, TODAY)
+
+        self.assertEqual(['Don\'t Do That'], [book.title for book in self.repository.top_sellers_last_week(1)])
+
+    def test_books_added_are_left_alone(self):
+        self.repository.add_sale(self.book1, 10, TODAY)
+
+        self.repository.best_sellers_last_week()
+
+        self.assertFalse(hasattr(self.book1, 'total_sales'))
+
+    def test_instances_of_the_same_saved_book_are_one_book(self):
+        author = Author(pk=1, name='Cam McHugh', phone_number='+13065551111')
+        self.repository.add_sale(Book(pk=1, title='Do This', author=author), 10, TODAY)
+        self.repository.add_sale(Book(pk=1, title='Do This', author=author), 5, TODAY)
+
+        best_seller, = self.repository.best_sellers_last_week()
+
+        self.assertEqual((1, 15, 2), (best_seller.pk, best_seller.total_sales, best_seller.total_sold))
+
+    def test_works_with_the_notifier(self):
+        self.repository.add_sale(self.book1, 10, TODAY)
+        client = FakeDwilioClient()
+
+        BestsellerNotifierVersion4(book_repository=self.repository, dwilio_client=client).notify_current_best_sellers()
+
+        self.assertEqual(
+            'Congratulations Cam McHugh, your book Do This sold 1 $10 this week',
+            client.notifications[0].message()
+        )
+
+
+# Guards the fake against drifting from the real thing.
+class TestInMemoryBookRepositoryMatchesORM(TestCase):
+
+    def test_random_sales_give_the_same_best_sellers(self):
+        rng = Random(0)
+        today = date.today()
+        in_memory = InMemoryBookRepository()
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        books = [Book.objects.create(title=f'Book {i}', author=author) for i in range(10)]
+        for _ in range(200):
+            book, price, sold_on = rng.choice(books), rng.randint(1, 20), today - timedelta(days=rng.randrange(20))
+            BookSold.objects.create(book=book, price=price, date=sold_on)
+            in_memory.add_sale(book, price, sold_on)
+
+        expected = {book.pk: (book.total_sales, book.total_sold) for book in BookRepository().best_sellers_last_week()}
+        actual = {book.pk: (book.total_sales, book.total_sold) for book in in_memory.best_sellers_last_week()}
+
+        self.assertEqual(expected, actual)
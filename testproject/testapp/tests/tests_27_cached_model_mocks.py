@@ -0,0 +1,64 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from ..dwilio import DwilioClient
+from ..models import Author, BestSellerManager, Book
+from ..notifiers import BestsellerNotifierVersion4
+from ..repository import BookRepository
+from .model_mocks import mock_model, mock_spec
+
+
+# The cases from tests_8_speccing_django_models, this time with mocks from model_mocks.
+class CachedModelMocks(SimpleTestCase):
+
+    def test_model_mock_can_be_assigned_to_a_relation(self):
+        mock_author = mock_model(Author)
+        book = Book()
+        book.author = mock_author
+        self.assertEqual(mock_author, book.author)
+
+    def test_forward_relations_are_model_mocks(self):
+        mock_book = mock_model(Book)
+        author = mock_book.author
+        another_book = Book()
+        another_book.author = author
+        self.assertEqual(author, another_book.author)
+        self.assertIsInstance(author, Author)
+
+    def test_attributes_are_specced(self):
+        mock_book = mock_model(Book, title='Dune')
+        self.assertEqual('Dune', mock_book.title)
+        with self.assertRaises(AttributeError):
+            mock_book.not_a_field
+
+    def test_annotations_can_be_set(self):
+        mock_book = mock_model(Book, total_sales=100)
+        self.assertEqual(100, mock_book.total_sales)
+
+    def test_each_call_returns_a_fresh_mock(self):
+        first, second = mock_model(Book), mock_model(Book)
+        first.title = 'Dune'
+        self.assertIsNot(first, second)
+        self.assertIsNot(first._state, second._state)
+        self.assertNotEqual('Dune', second.title)
+
+    def test_managers_can_be_specced(self):
+        mock_manager = mock_spec(BestSellerManager)
+        mock_manager.bestsellers.return_value = []
+        self.assertEqual([], mock_manager.bestsellers(since=date.today()))
+        with self.assertRaises(AttributeError):
+            mock_manager.best_sellers
+
+    def test_works_with_notifiers(self):
+        mock_book = mock_model(Book, title='Dune', total_sales=100)
+        mock_book.author.name = 'Frank Herbert'
+        mock_book.author.phone_number = '555-1234'
+        mock_repository = mock_spec(BookRepository)
+        mock_repository.best_sellers_last_week.return_value = [mock_book]
+        mock_dwilio_client = mock_spec(DwilioClient)
+
+        BestsellerNotifierVersion4(mock_repository, mock_dwilio_client).notify_current_best_sellers()
+
+        notification = list(mock_dwilio_client.send_notifications.call_args[0][0])[0]
+        self.assertEqual('555-1234', notification.to_number())
@@ -0,0 +1,83 @@
+from django.test import SimpleTestCase, TestCase
+
+from ..dwilio import BestSellerNotification
+from ..models import Author, Book
+from ..notifiers import BestsellerNotifierVersion4
+from ..repository import BookRepository
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import RecordingDwilioClient
+
+
+def make_best_seller():
+    book = Book(title='Do This', author=Author(name='Bob', phone_number='+13065551234'))
+    book.total_sold = 2
+    book.total_sales = 18
+    return book
+
+
+class TestBestSellerNotification(SimpleTestCase):
+
+    def test_from_row_matches_from_book(self):
+        from_book = BestSellerNotification(make_best_seller())
+        from_row = BestSellerNotification.from_row((1, 'Do This', 'Bob', '+13065551234', 2, 18))
+        self.assertEqual('Congratulations Bob, your book Do This sold 2 $18 this week', from_row.message())
+        self.assertEqual(from_book.message(), from_row.message())
+        self.assertEqual(from_book.to_number(), from_row.to_number())
+
+    def test_message_is_rendered_once(self):
+        book = make_best_seller()
+        notification = BestSellerNotification(book)
+        message = notification.message()
+        book.title = 'Do That'
+        self.assertIs(message, notification.message())
+
+    def test_notifications_have_no_instance_dict(self):
+        notification = BestSellerNotification.from_row((1, 'Do This', 'Bob', '+13065551234', 2, 18))
+        self.assertFalse(hasattr(notification, '__dict__'))
+
+
+class TwoWayRepository(object):
+
+    def best_sellers_last_week(self):
+        return [make_best_seller()]
+
+    def best_seller_notifications_last_week(self):
+        return [BestSellerNotification.from_row((1, 'From A Row', 'Bob', '+13065551234', 1, 9))]
+
+
+class TestVersion4Notifications(SimpleTestCase):
+
+    def test_books_are_wrapped_by_default(self):
+        client = RecordingDwilioClient()
+        BestsellerNotifierVersion4(TwoWayRepository(), client).notify_current_best_sellers()
+        self.assertEqual([('+13065551234', 'Congratulations Bob, your book Do This sold 2 $18 this week')], client.sent)
+
+    def test_rows_uses_the_repository_notifications(self):
+        client = RecordingDwilioClient()
+        BestsellerNotifierVersion4(TwoWayRepository(), client, rows=True).notify_current_best_sellers()
+        self.assertEqual([('+13065551234', 'Congratulations Bob, your book From A Row sold 1 $9 this week')],
+                         client.sent)
+
+    def test_rows_by_default_with_the_default_repository(self):
+        self.assertTrue(BestsellerNotifierVersion4(dwilio_client=RecordingDwilioClient()).rows)
+        self.assertFalse(BestsellerNotifierVersion4(TwoWayRepository(), RecordingDwilioClient()).rows)
+
+
+class TestBookRepositoryNotifications(TestCase):
+
+    def setUp(self):
+        create_best_sellers(3)
+
+    def assertMatchesBooks(self, repository):
+        expected = sorted((BestSellerNotification(book).to_number(), BestSellerNotification(book).message())
+                          for book in repository.best_sellers_last_week())
+        with self.assertNumQueries(1):
+            notifications = list(repository.best_seller_notifications_last_week())
+        self.assertEqual(expected, sorted((n.to_number(), n.message()) for n in notifications))
+        self.assertEqual(3, len(notifications))
+
+    def test_notifications_match_best_sellers(self):
+        self.assertMatchesBooks(BookRepository())
+
+    def test_streamed_notifications_match_best_sellers(self):
+        self.assertMatchesBooks(BookRepository(stream=True, chunk_size=2))
@@ -0,0 +1,101 @@
+from datetime import date
+from itertools import islice
+from types import SimpleNamespace
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Book, NotificationRun, NotificationSent
+from ..notifiers import BestsellerNotifierVersion4
+from ..repository import BookRepository
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import RecordingDwilioClient
+
+WINDOW_START = date(2021, 3, 8)
+
+
+# Small batches sent one at a time, so a crash or a failure part way through leaves some batches sent.
+def recording_client(fail_numbers=()):
+    return RecordingDwilioClient(fail_numbers, batch_size=2, max_in_flight=1)
+
+
+class FakeRepository(object):
+
+    def __init__(self, books):
+        self.books = books
+
+    def best_sellers_last_week(self):
+        return self.books
+
+
+# Dies part way through, like a run killed at book 30,000.
+class CrashingBookRepository(BookRepository):
+
+    def __init__(self, crash_after):
+        super().__init__()
+        self.crash_after = crash_after
+
+    def best_seller_notifications_last_week(self):
+        yield from islice(super().best_seller_notifications_last_week(), self.crash_after)
+        raise RuntimeError('crashed')
+
+
+class TestResumableNotificationRuns(TestCase):
+
+    def setUp(self):
+        create_best_sellers(10)
+
+    def test_run_records_every_book_sent(self):
+        run = NotificationRun.objects.for_window(WINDOW_START)
+        client = recording_client()
+        BestsellerNotifierVersion4(BookRepository(), client, rows=True).notify_current_best_sellers(run)
+        self.assertEqual(10, len(client.sent))
+        self.assertEqual(set(Book.objects.values_list('pk', flat=True)), run.sent_book_ids())
+        self.assertIsNotNone(run.finished_at)
+
+    def test_restart_only_sends_what_is_left(self):
+        client = recording_client()
+        with self.assertRaises(RuntimeError):
+            BestsellerNotifierVersion4(CrashingBookRepository(crash_after=5), client, rows=True).\
+                notify_current_best_sellers(NotificationRun.objects.for_window(WINDOW_START))
+        self.assertEqual(4, NotificationSent.objects.count())
+
+        run = NotificationRun.objects.for_window(WINDOW_START)
+        self.assertIsNone(run.finished_at)
+        restarted_client = recording_client()
+        # one query for the ledger, whatever its size
+        with self.assertNumQueries(1):
+            run.sent_book_ids()
+        BestsellerNotifierVersion4(BookRepository(), restarted_client, rows=True).notify_current_best_sellers(run)
+
+        self.assertEqual(6, len(restarted_client.sent))
+        self.assertEqual(10, len(set(client.sent_numbers) | set(restarted_client.sent_numbers)))
+        self.assertIsNotNone(run.finished_at)
+
+    def test_failed_sends_are_retried_by_the_next_run(self):
+        run = NotificationRun.objects.for_window(WINDOW_START)
+        BestsellerNotifierVersion4(BookRepository(), recording_client(fail_numbers={'+13065550003'}), rows=True).\
+            notify_current_best_sellers(run)
+        self.assertEqual(8, NotificationSent.objects.count())
+        self.assertIsNone(run.finished_at)
+
+        client = recording_client()
+        BestsellerNotifierVersion4(BookRepository(), client, rows=True).notify_current_best_sellers(run)
+        self.assertEqual(2, len(client.sent))
+        self.assertIsNotNone(run.finished_at)
+
+    def test_runs_are_per_window(self):
+        run = NotificationRun.objects.for_window(WINDOW_START)
+        self.assertEqual(run, NotificationRun.objects.for_window(WINDOW_START))
+        self.assertNotEqual(run, NotificationRun.objects.for_window(date(2020, 1, 1)))
+
+    def test_books_without_a_pk_are_sent_but_not_recorded(self):
+        book = SimpleNamespace(title='Do This', author=SimpleNamespace(name='Bob', phone_number='+13065551234'),
+                               total_sold=1, total_sales=10)
+        run = NotificationRun.objects.for_window(WINDOW_START)
+        client = recording_client()
+
+        BestsellerNotifierVersion4(FakeRepository([book]), client).notify_current_best_sellers(run)
+
+        self.assertEqual(['+13065551234'], client.sent_numbers)
+        self.assertFalse(NotificationSent.objects.exists())
+        self.assertTrue(timezone.is_aware(run.finished_at))
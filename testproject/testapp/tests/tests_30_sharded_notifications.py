@@ -0,0 +1,124 @@
+from concurrent.futures import Future
+from datetime import date
+from io import StringIO
+from multiprocessing import get_start_method
+from unittest import SkipTest, skipUnless
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from ..models import Book, NotificationRun
+from ..repository import BookRepository
+from ..sharding import notify_sharded, parse_shard
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import RecordingDwilioClient
+
+WINDOW_START = date(2021, 3, 8)
+
+
+# Runs each shard as it's submitted, the test database isn't visible to other processes.
+class InlineExecutor(object):
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class TestParseShard(SimpleTestCase):
+
+    def test_parses_index_and_count(self):
+        self.assertEqual((2, 4), parse_shard('2/4'))
+
+    def test_rejects_bad_shards(self):
+        for value in ('4/4', '-1/4', '1', 'a/b'):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+
+class TestShardedNotifications(TestCase):
+
+    # every shard sends through the one client, so it sees the whole run.
+    def setUp(self):
+        self.dwilio_client = RecordingDwilioClient()
+        patcher = patch('testapp.sharding.DwilioClient', new=lambda: self.dwilio_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        create_best_sellers(10)
+
+    def test_shards_cover_every_best_seller_once(self):
+        shards = [[notification.book_id for notification in
+                   BookRepository(shard=(index, 3)).best_seller_notifications_last_week()] for index in range(3)]
+        book_ids = [book_id for shard in shards for book_id in shard]
+        self.assertEqual(sorted(Book.objects.values_list('pk', flat=True)), sorted(book_ids))
+        self.assertTrue(all(shards))
+
+    def test_reports_are_merged(self):
+        report = notify_sharded(3, executor=InlineExecutor())
+        self.assertEqual(3, len(report.shards))
+        self.assertEqual(10, report.sent)
+        self.assertEqual(0, report.failed)
+        self.assertEqual(10, len(set(self.dwilio_client.sent_numbers)))
+
+    def test_run_is_finished_once_every_shard_is_done(self):
+        run = NotificationRun.objects.for_window(WINDOW_START)
+        notify_sharded(3, run, executor=InlineExecutor())
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(set(Book.objects.values_list('pk', flat=True)), run.sent_book_ids())
+
+    def test_command_sends_one_shard(self):
+        out = StringIO()
+        call_command('notify_best_sellers', '--shard', '1/2', '--resume', str(WINDOW_START), stdout=out)
+        self.assertIn('Shard 1/2: 5 sent, 0 failed', out.getvalue())
+        self.assertEqual(5, len(self.dwilio_client.sent))
+        self.assertIsNone(NotificationRun.objects.for_window(WINDOW_START).finished_at)
+
+    def test_unsharded_resume_finishes_a_sharded_run(self):
+        for shard in ('0/2', '1/2'):
+            call_command('notify_best_sellers', '--shard', shard, '--resume', str(WINDOW_START), stdout=StringIO())
+        self.dwilio_client.sent = []
+
+        call_command('notify_best_sellers', '--resume', str(WINDOW_START), stdout=StringIO())
+
+        self.assertEqual([], self.dwilio_client.sent)
+        self.assertIsNotNone(NotificationRun.objects.for_window(WINDOW_START).finished_at)
+
+    def test_workers_must_be_positive(self):
+        for workers in ('0', '-1'):
+            with self.assertRaisesMessage(CommandError, '--workers must be at least 1'):
+                call_command('notify_best_sellers', '--workers', workers, stdout=StringIO())
+        self.assertRaises(ValueError, notify_sharded, 0, executor=InlineExecutor())
+
+
+# The real process pool. The workers open their own connections, so they need a database other processes can see
+# (not SQLite's in-memory one), and they inherit the patched DwilioClient by being forked.
+@skipUnless(get_start_method() == 'fork', 'Workers only inherit the patch when forked')
+@patch('testapp.sharding.DwilioClient', new=RecordingDwilioClient)
+class TestShardedNotificationsInProcesses(TransactionTestCase):
+
+    # checked here rather than on import, by now settings_dict names the test database rather than the configured one.
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise SkipTest('Needs a database workers can see')
+        super().setUpClass()
+
+    def test_shards_run_in_worker_processes(self):
+        create_best_sellers(10)
+        run = NotificationRun.objects.for_window(WINDOW_START)
+
+        report = notify_sharded(2, run)
+
+        self.assertEqual((10, 0), (report.sent, report.failed))
+        self.assertEqual(2, len({shard.index for shard in report.shards}))
+        run.refresh_from_db()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(set(Book.objects.values_list('pk', flat=True)), run.sent_book_ids())
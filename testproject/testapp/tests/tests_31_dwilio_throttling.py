@@ -0,0 +1,156 @@
+from time import monotonic
+from django.test import SimpleTestCase
+
+from ..dwilio import DwilioClient
+from ..throttling import AIMDConcurrencyLimit, TokenBucket
+from ..transport import PooledHttpTransport
+from .fake_dwilio_server import FakeDwilioServer
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeNotification(object):
+
+    def __init__(self, number):
+        self.number = number
+
+    def to_number(self):
+        return self.number
+
+    def message(self):
+        return f'Hello {self.number}'
+
+
+class TestTokenBucket(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(10, burst=5, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_goes_straight_through(self):
+        waits = [self.bucket.acquire() for _ in range(5)]
+        self.assertEqual([0] * 5, waits)
+
+    def test_then_waits_for_tokens(self):
+        for _ in range(5):
+            self.bucket.acquire()
+        self.assertAlmostEqual(0.1, self.bucket.acquire())
+        self.assertAlmostEqual(0.1, self.bucket.acquire())
+
+    def test_tokens_refill_over_time(self):
+        for _ in range(5):
+            self.bucket.acquire()
+        self.clock.sleep(0.3)
+        self.assertEqual([0, 0, 0], [self.bucket.acquire() for _ in range(3)])
+
+    def test_requests_bigger_than_burst_wait_their_turn(self):
+        self.assertAlmostEqual(0.5, self.bucket.acquire(10))
+        self.assertAlmostEqual(0.1, self.bucket.acquire())
+
+
+class TestAIMDConcurrencyLimit(SimpleTestCase):
+
+    def release(self, limit, count, **kwargs):
+        for _ in range(count):
+            limit.acquire()
+            limit.release(**kwargs)
+
+    def test_successes_increase_the_limit_additively(self):
+        limit = AIMDConcurrencyLimit(initial=4, maximum=10)
+        self.release(limit, 4)
+        self.assertAlmostEqual(5, limit.limit, delta=0.1)
+
+    def test_throttling_decreases_the_limit_multiplicatively(self):
+        limit = AIMDConcurrencyLimit(initial=8)
+        self.release(limit, 1, throttled=True)
+        self.assertEqual(4, limit.limit)
+
+    def test_slow_responses_count_as_throttling(self):
+        limit = AIMDConcurrencyLimit(initial=8, latency_target=0.5)
+        self.release(limit, 1, latency=1)
+        self.assertEqual(4, limit.limit)
+
+    def test_slow_responses_count_as_throttling_by_default(self):
+        limit = AIMDConcurrencyLimit(initial=8)
+        self.release(limit, 1, latency=0.1)
+        self.release(limit, 1, latency=5)
+        self.assertAlmostEqual(4, limit.limit, delta=0.1)
+
+    def test_limit_stays_within_bounds(self):
+        limit = AIMDConcurrencyLimit(initial=2, minimum=1, maximum=3)
+        self.release(limit, 5, throttled=True)
+        self.assertEqual(1, limit.limit)
+        self.release(limit, 50)
+        self.assertEqual(3, limit.limit)
+
+
+# Against a fake provider with a quota, through the real client and transport.
+class TestDwilioClientThrottling(SimpleTestCase):
+
+    def notifications(self, count):
+        return [FakeNotification(f'+1306555{i:04}') for i in range(count)]
+
+    def test_rate_limiter_keeps_throughput_near_the_quota(self):
+        with FakeDwilioServer(rate_limit=200, burst=20) as server:
+            client = DwilioClient(PooledHttpTransport(), server.base_url, batch_size=1, max_in_flight=8,
+                                  rate_limiter=TokenBucket(190, burst=20))
+            started = monotonic()
+            results = client.send_notifications(self.notifications(120))
+            seconds = monotonic() - started
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(120, len(server.messages))
+        self.assertLessEqual(server.throttled, 5)
+        # (120 - 20 burst) / 190 a second, at the least
+        self.assertGreater(seconds, 0.5)
+        self.assertLess(seconds, 1.5)
+
+    def test_batches_cost_a_token_per_message(self):
+        with FakeDwilioServer(rate_limit=100, burst=10) as server:
+            client = DwilioClient(PooledHttpTransport(), server.base_url, batch_size=10, max_in_flight=4,
+                                  rate_limiter=TokenBucket(95, burst=10))
+            results = client.send_notifications(self.notifications(50))
+        self.assertTrue(all(result.success for result in results))
+        self.assertLessEqual(server.throttled, 2)
+
+    def test_concurrency_adapts_to_the_providers_limit(self):
+        with FakeDwilioServer(max_concurrent=3, latency=0.01) as server:
+            client = DwilioClient(PooledHttpTransport(max_connections_per_host=16), server.base_url, batch_size=1,
+                                  max_in_flight=16, throttle_retries=5, throttle_backoff=0.01)
+            results = client.send_notifications(self.notifications(200))
+        self.assertTrue(all(result.success for result in results))
+        self.assertLessEqual(client.concurrency_limit.limit, 6)
+        # 16 at a time regardless gets several 429s per message sent, AIMD keeps it to the odd probe past the limit.
+        self.assertLess(server.throttled, 100)
+
+    def test_retry_after_is_honoured(self):
+        sleeps = []
+        with FakeDwilioServer(status_code=429, retry_after=2) as server:
+            client = DwilioClient(PooledHttpTransport(), server.base_url, throttle_retries=1, throttle_backoff=0.001,
+                                  sleep=sleeps.append)
+            client.send_notifications(self.notifications(1))
+        self.assertEqual([2.0], sleeps)
+
+    def test_server_errors_shrink_the_concurrency_limit(self):
+        with FakeDwilioServer(status_code=500) as server:
+            client = DwilioClient(PooledHttpTransport(retries=0), server.base_url, batch_size=1, max_in_flight=8)
+            results = client.send_notifications(self.notifications(3))
+        self.assertFalse(any(result.success for result in results))
+        self.assertEqual(3, len(server.messages))
+        self.assertEqual(1, client.concurrency_limit.limit)
+
+    def test_gives_up_when_throttling_persists(self):
+        with FakeDwilioServer(status_code=429) as server:
+            client = DwilioClient(PooledHttpTransport(), server.base_url, throttle_retries=2, throttle_backoff=0.001)
+            results = client.send_notifications(self.notifications(1))
+        self.assertFalse(results[0].success)
+        self.assertEqual(3, len(server.messages))
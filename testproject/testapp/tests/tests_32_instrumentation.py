@@ -0,0 +1,133 @@
+from unittest.mock import patch
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+
+from .. import instrumentation
+from ..billing import BillingSystem
+from ..dwilio import DwilioClient
+from ..instrumentation import InMemorySink, LoggingSink, PrometheusSink
+from ..notifiers import AsyncBestsellerNotifier
+from ..pay_per_use_formatter import PayPerUseStringFormatter
+from ..repository import BookRepository
+from ..slow_formatter import SlowStringFormatter
+from ..transport import PooledHttpTransport
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import AsyncRecordingDwilioClient
+from .fake_dwilio_server import FakeDwilioServer
+
+
+class FakeBillingTransport(object):
+
+    def post_json(self, url, post_body):
+        return {'status_code': 200, 'response': {'success': True, 'new_balance': 50}}
+
+
+class FakeNotification(object):
+
+    def to_number(self):
+        return '+13065551234'
+
+    def message(self):
+        return 'Hello'
+
+
+class TestInstrumentation(SimpleTestCase):
+
+    def test_nothing_is_recorded_without_sinks(self):
+        rows = [1, 2]
+        self.assertIs(rows, instrumentation.timed_iteration('rows', rows))
+        self.assertIs(instrumentation.timer('a'), instrumentation.timer('b'))
+
+    def test_in_memory_sink_records_while_added(self):
+        with InMemorySink() as sink:
+            with instrumentation.timer('block_seconds', kind='test'):
+                pass
+            instrumentation.increment('things', 2)
+            instrumentation.increment('things')
+        instrumentation.increment('things')
+        self.assertEqual(1, len(sink.values('block_seconds', kind='test')))
+        self.assertEqual(3, sink.count('things'))
+
+    def test_timed_iteration_counts_rows(self):
+        with InMemorySink() as sink:
+            self.assertEqual([1, 2, 3], list(instrumentation.timed_iteration('rows', iter([1, 2, 3]))))
+        self.assertEqual(3, sink.count('rows_rows'))
+        self.assertEqual(1, len(sink.values('rows_seconds')))
+
+    def test_prometheus_exposition(self):
+        sink = PrometheusSink(buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 2):
+            sink.record('histogram', 'send_seconds', value, (('outcome', 'sent'),))
+        sink.record('counter', 'sent', 4, ())
+        self.assertEqual(
+            '# TYPE sent_total counter\n'
+            'sent_total 4\n'
+            '# TYPE send_seconds histogram\n'
+            'send_seconds_bucket{outcome="sent",le="0.1"} 1\n'
+            'send_seconds_bucket{outcome="sent",le="1"} 3\n'
+            'send_seconds_bucket{outcome="sent",le="+Inf"} 4\n'
+            'send_seconds_sum{outcome="sent"} 3.05\n'
+            'send_seconds_count{outcome="sent"} 4\n',
+            sink.exposition()
+        )
+
+    def test_logging_sink(self):
+        sink = LoggingSink()
+        with self.assertLogs('testapp.instrumentation', level='DEBUG') as logs:
+            sink.record('counter', 'sent', 1, (('outcome', 'sent'),))
+        self.assertEqual(['DEBUG:testapp.instrumentation:counter sent outcome=sent 1'], logs.output)
+
+
+class TestInstrumentedHotPaths(SimpleTestCase):
+
+    @patch.object(SlowStringFormatter, '_this_is_the_slow_part')
+    def test_concatenate_splits_into_billing_and_formatting(self, _):
+        formatter = PayPerUseStringFormatter(SlowStringFormatter(), BillingSystem(transport=FakeBillingTransport()))
+        with InMemorySink() as sink:
+            formatter.concatenate('a', 'b', 'c')
+        for name in ('pay_per_use_concatenate_seconds', 'billing_charge_seconds', 'formatter_format_seconds'):
+            self.assertEqual(1, len(sink.values(name)), name)
+
+    def test_dwilio_sends(self):
+        with FakeDwilioServer() as server, InMemorySink() as sink:
+            client = DwilioClient(PooledHttpTransport(), server.base_url, batch_size=2)
+            client.send_notification(FakeNotification())
+            client.send_notifications([FakeNotification()] * 3)
+        self.assertEqual(1, len(sink.values('dwilio_send_seconds')))
+        self.assertEqual(2, len(sink.values('dwilio_batch_send_seconds')))
+        self.assertEqual(3, sink.count('dwilio_notifications', outcome='sent'))
+
+    def test_dwilio_throttling(self):
+        with FakeDwilioServer(status_code=429) as server, InMemorySink() as sink:
+            client = DwilioClient(PooledHttpTransport(), server.base_url, throttle_retries=1, throttle_backoff=0.001)
+            client.send_notifications([FakeNotification()])
+        self.assertEqual(2, sink.count('dwilio_throttled'))
+        self.assertEqual(1, sink.count('dwilio_notifications', outcome='failed'))
+
+
+class TestInstrumentedRepository(TestCase):
+
+    def setUp(self):
+        create_best_sellers(3)
+
+    def test_query_time_and_rows_are_recorded(self):
+        with InMemorySink() as sink:
+            list(BookRepository(stream=True).best_seller_notifications_last_week())
+        labels = {'stream': True, 'leaderboard': False}
+        self.assertEqual(3, sink.count('repository_best_seller_notifications_rows', **labels))
+        self.assertEqual(1, len(sink.values('repository_best_seller_notifications_seconds', **labels)))
+
+    def test_results_are_still_a_queryset(self):
+        with InMemorySink() as sink:
+            best_sellers = BookRepository().best_sellers_last_week()
+            self.assertIsInstance(best_sellers, QuerySet)
+            self.assertEqual(2, best_sellers.filter(title__in=['Book 0', 'Book 1']).count())
+            self.assertEqual(3, len(best_sellers))
+        self.assertEqual(3, sink.count('repository_best_sellers_rows', stream=False, leaderboard=False))
+
+    async def test_async_notifier_is_recorded(self):
+        client = AsyncRecordingDwilioClient()
+        with InMemorySink() as sink:
+            await AsyncBestsellerNotifier(dwilio_client=client).notify_current_best_sellers()
+        self.assertEqual(3, len(client.sent))
+        self.assertEqual(3, sink.count('repository_best_sellers_rows', stream=False, leaderboard=False))
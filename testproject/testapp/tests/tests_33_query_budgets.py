@@ -0,0 +1,142 @@
+from datetime import date
+from unittest.mock import patch
+from django.test import SimpleTestCase, TestCase
+
+from ..models import Author, Book, BookSold, NotificationRun, WeeklyBookSales
+from ..notifiers import AsyncBestsellerNotifier, \
+    BestsellerNotifierVersion1, \
+    BestsellerNotifierVersion2, \
+    BestsellerNotifierVersion3, \
+    BestsellerNotifierVersion4
+from ..query_budget import QueryBudget, QueryBudgetExceeded, fingerprint
+from ..repository import BookRepository
+from .best_sellers import create_best_sellers
+from .fake_dwilio_client import AsyncRecordingDwilioClient, RecordingDwilioClient
+
+BEST_SELLERS = 30
+# A backstop against a query gone badly wrong (a lost index on a big table, say), generous enough for a slow CI
+# machine. At this scale a query per book still takes milliseconds in all, catching those is for the queries and
+# duplicates budgets.
+DB_SECONDS = 1
+
+
+class TestFingerprint(SimpleTestCase):
+
+    def test_literals_and_placeholders_are_ignored(self):
+        self.assertEqual(fingerprint('SELECT * FROM book WHERE id = %s'),
+                         fingerprint('SELECT * FROM book WHERE id = 7'))
+        self.assertEqual(fingerprint("SELECT * FROM author WHERE name = 'Cam'"),
+                         fingerprint("SELECT * FROM author WHERE name = 'Bob'"))
+
+    def test_in_lists_of_any_length_match(self):
+        self.assertEqual(fingerprint('SELECT * FROM book WHERE id IN (%s, %s, %s)'),
+                         fingerprint('SELECT * FROM book WHERE id IN (%s)'))
+
+
+class TestQueryBudget(TestCase):
+
+    def setUp(self):
+        author = Author.objects.create(name='Cam McHugh', phone_number='+13065551111')
+        self.books = [Book.objects.create(title=f'Book {i}', author=author) for i in range(3)]
+
+    def test_records_queries_and_time(self):
+        with QueryBudget() as budget:
+            list(Book.objects.all())
+        self.assertEqual(1, budget.count)
+        self.assertGreater(budget.total_seconds, 0)
+
+    def test_fails_over_the_query_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(queries=1):
+                list(Book.objects.all())
+                list(Author.objects.all())
+
+    def test_fails_over_the_time_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(seconds=0):
+                list(Book.objects.all())
+
+    def test_catches_n_plus_one(self):
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with QueryBudget(duplicates=0):
+                for book in Book.objects.all():
+                    book.author.name
+        self.assertIn('ran 3 times', str(raised.exception))
+
+    def test_works_as_a_decorator(self):
+        @QueryBudget(queries=1)
+        def titles():
+            return [book.title for book in Book.objects.all()]
+
+        self.assertEqual(3, len(titles()))
+
+    def test_each_decorated_call_has_its_own_budget(self):
+        @QueryBudget(queries=2)
+        def count_books(depth):
+            nested = count_books(depth - 1) if depth else 0
+            return nested + Book.objects.count()
+
+        # the innermost two calls are within budget, the outermost counts its own query and both nested ones.
+        with self.assertRaisesMessage(QueryBudgetExceeded, '3 queries, the budget is 2'):
+            count_books(2)
+        self.assertEqual(6, count_books(1))
+
+
+# Every notifier and repository method, at BEST_SELLERS best sellers, must stay within its budget.
+@patch('testapp.notifiers.DwilioClient', new=RecordingDwilioClient)
+class TestNotifierQueryBudgets(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_best_sellers(BEST_SELLERS)
+        # start the leaderboard, as the daily advance_leaderboard run would have.
+        WeeklyBookSales.objects.advance(date.today())
+
+    def test_version1(self):
+        with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+            BestsellerNotifierVersion1().notify_current_best_sellers()
+
+    def test_version2(self):
+        with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+            BestsellerNotifierVersion2().notify_current_best_sellers()
+
+    def test_version3(self):
+        with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+            BestsellerNotifierVersion3().notify_current_best_sellers()
+
+    def test_version4(self):
+        for rows in (False, True):
+            with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+                BestsellerNotifierVersion4(rows=rows).notify_current_best_sellers()
+
+    # the best sellers, the ledger, one insert per batch of 10 and finishing the run.
+    def test_version4_with_a_run(self):
+        run = NotificationRun.objects.for_window(date(2021, 3, 8))
+        batches = BEST_SELLERS // 10
+        with QueryBudget(queries=3 + batches, seconds=DB_SECONDS, duplicates=batches - 1):
+            BestsellerNotifierVersion4(dwilio_client=RecordingDwilioClient(batch_size=10), rows=True).\
+                notify_current_best_sellers(run)
+
+    # QueryBudget only sees the thread that entered it. The async ORM's queries are counted because sync_to_async runs
+    # them back on that thread, queries from other threads (executor workers, say) wouldn't be.
+    async def test_async_notifier(self):
+        with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+            await AsyncBestsellerNotifier(dwilio_client=AsyncRecordingDwilioClient()).notify_current_best_sellers()
+
+    def test_repository(self):
+        for repository in (BookRepository(), BookRepository(stream=True), BookRepository(leaderboard=True)):
+            for method in (repository.best_sellers_last_week, repository.best_seller_notifications_last_week):
+                with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+                    for best_seller in method():
+                        getattr(best_seller, 'author', None)
+
+    def test_top_sellers(self):
+        with QueryBudget(queries=1, seconds=DB_SECONDS, duplicates=0):
+            for book in BookRepository().top_sellers_last_week(10):
+                book.author.phone_number
+
+    # the insert, an update of each rollup and the window read between them, inside a savepoint (two more).
+    def test_recording_a_sale(self):
+        book = Book.objects.first()
+        with QueryBudget(queries=6, seconds=DB_SECONDS):
+            BookSold.objects.create(book=book, price=10, date=date.today())
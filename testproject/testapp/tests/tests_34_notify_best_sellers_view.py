@@ -0,0 +1,56 @@
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+
+from ..dwilio import NotificationResult
+
+URL = '/notifications/best-sellers/'
+
+
+class FakeAsyncBestsellerNotifier(object):
+    runs = 0
+
+    async def notify_current_best_sellers(self):
+        FakeAsyncBestsellerNotifier.runs += 1
+        return [NotificationResult(None, True), NotificationResult(None, False)]
+
+
+@patch('testapp.views.AsyncBestsellerNotifier', new=FakeAsyncBestsellerNotifier)
+class TestNotifyBestSellersView(TestCase):
+
+    def setUp(self):
+        FakeAsyncBestsellerNotifier.runs = 0
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        self.user = User.objects.create(username='user')
+
+    def test_anonymous_post_is_rejected(self):
+        response = self.client.post(URL)
+
+        self.assertEqual(403, response.status_code)
+        self.assertEqual(0, FakeAsyncBestsellerNotifier.runs)
+
+    def test_non_staff_post_is_rejected(self):
+        self.client.force_login(self.user)
+
+        self.assertEqual(403, self.client.post(URL).status_code)
+        self.assertEqual(0, FakeAsyncBestsellerNotifier.runs)
+
+    def test_post_without_csrf_token_is_rejected(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.staff)
+
+        self.assertEqual(403, client.post(URL).status_code)
+        self.assertEqual(0, FakeAsyncBestsellerNotifier.runs)
+
+    def test_staff_can_start_a_run(self):
+        self.client.force_login(self.staff)
+
+        response = self.client.post(URL)
+
+        self.assertEqual({'sent': 1, 'failed': 1}, response.json())
+        self.assertEqual(1, FakeAsyncBestsellerNotifier.runs)
+
+    def test_get_is_not_allowed(self):
+        self.client.force_login(self.staff)
+
+        self.assertEqual(405, self.client.get(URL).status_code)
@@ -23,6 +23,10 @@ class FakeDwilioClient(object):
     def send_notification(self, notification):
         self._notifications.append(notification)
 
+    def send_notifications(self, notifications):
+        for notification in notifications:
+            self.send_notification(notification)
+
 
 # No mocking or patching here.
 # Are fakes better than mocks? I'm on the fence. Both have a cost, both need to be maintained.
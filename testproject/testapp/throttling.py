@@ -0,0 +1,59 @@
+from threading import Condition, Lock
+from time import monotonic, sleep
+
+
+# Allows rate tokens a second on average, with bursts of up to burst. Taking more tokens than are available puts
+# the bucket in debt and the caller sleeps it off, so a request bigger than burst (a large batch) still goes through,
+# it just waits its turn. Thread safe, callers are served roughly in arrival order.
+class TokenBucket(object):
+
+    def __init__(self, rate, burst=None, clock=monotonic, sleep=sleep):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = Lock()
+
+    def acquire(self, tokens=1):
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+# How many requests may be in flight at once, adjusted additive increase, multiplicative decrease (as TCP does):
+# each success adds increase / limit (so about increase per limit requests), and each throttled response, or success
+# slower than latency_target seconds, multiplies it by decrease. latency_target=None only backs off when throttled.
+# Used as acquire() ... release(throttled, latency).
+class AIMDConcurrencyLimit(object):
+
+    def __init__(self, initial=8, minimum=1, maximum=64, increase=1.0, decrease=0.5, latency_target=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._condition = Condition()
+
+    def acquire(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self, throttled=False, latency=None):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled or (self.latency_target is not None and latency is not None and latency > self.latency_target):
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
@@ -0,0 +1,176 @@
+import json
+from email.utils import parsedate_to_datetime
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from random import random
+from select import select
+from threading import BoundedSemaphore, Lock
+from time import sleep, time
+from urllib.parse import urlsplit
+
+
+class TransportException(Exception):
+    pass
+
+
+# Raised by _request when the request never left, so it is always safe to retry.
+class _NotSent(Exception):
+    pass
+
+
+# Keep-alive HTTP connections, pooled per (scheme, host, port) and shared by every client given the same transport,
+# so a TLS handshake is paid once per connection rather than once per request.
+# POSTs aren't idempotent, so by default only requests that never got as far as sending a byte (the connection
+# couldn't be made) are retried. Requests sent with an idempotency_key, which goes out as the Idempotency-Key header so
+# the server can recognise a repeat, are also retried when they lose their connection or get a retry_statuses
+# response. Either way there are up to retries retries, with full jitter exponential backoff, or after however long
+# the response's Retry-After asked for if that's longer.
+# Servers close keep-alive connections that sit idle, so a pooled connection is only reused if its socket is still
+# open, and a reused one that turns out to have been closed anyway (the server hung up between the check and the
+# request) is replaced by a fresh connection once, key or not, as the server never got to respond.
+class PooledHttpTransport(object):
+
+    def __init__(self, max_connections_per_host=10, timeout=10, retries=2, backoff=0.1,
+                 retry_statuses=(502, 503, 504), sleep=sleep, random=random):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_statuses = retry_statuses
+        self.sleep = sleep
+        self.random = random
+        self._pools = {}
+        self._lock = Lock()
+
+    def _pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = (BoundedSemaphore(self.max_connections_per_host), [])
+            return self._pools[key]
+
+    def _connect(self, scheme, host, port):
+        connection_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        return connection_class(host, port, timeout=self.timeout)
+
+    # Whether an idle connection can still be used: nothing should arrive on it between requests, so if it's readable
+    # the server has closed it (or sent something we can't make sense of).
+    def _is_open(self, connection):
+        if connection.sock is None:
+            return False
+        try:
+            readable, _, _ = select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _idle_connection(self, idle):
+        while True:
+            with self._lock:
+                connection = idle.pop() if idle else None
+            if connection is None or self._is_open(connection):
+                return connection
+            connection.close()
+
+    def _new_connection(self, key):
+        connection = self._connect(*key)
+        try:
+            connection.connect()
+        except (OSError, HTTPException) as e:
+            connection.close()
+            raise _NotSent(e) from e
+        return connection
+
+    def _send(self, connection, url, body, headers):
+        path = (url.path or '/') + ('?' + url.query if url.query else '')
+        try:
+            connection.request('POST', path, body, headers)
+            return connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+
+    def _request(self, url, body, headers):
+        key = (url.scheme, url.hostname, url.port)
+        slots, idle = self._pool(key)
+        if not slots.acquire(timeout=self.timeout):
+            raise TransportException(f'No free connection to {url.netloc} after {self.timeout}s')
+        try:
+            connection = self._idle_connection(idle)
+            if connection is None:
+                connection = self._new_connection(key)
+                response = self._send(connection, url, body, headers)
+            else:
+                try:
+                    response = self._send(connection, url, body, headers)
+                # RemoteDisconnected is a ConnectionResetError.
+                except (BrokenPipeError, ConnectionResetError):
+                    connection = self._new_connection(key)
+                    response = self._send(connection, url, body, headers)
+            try:
+                content = response.read()
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                with self._lock:
+                    idle.append(connection)
+            return response.status, {name.lower(): value for name, value in response.getheaders()}, content
+        finally:
+            slots.release()
+
+    # Returns {'status_code': ..., 'headers': {<lower cased name>: value}, 'response': <decoded json body or None>}.
+    def post_json(self, url, post_body, idempotency_key=None):
+        url = urlsplit(url)
+        body = json.dumps(post_body).encode()
+        headers = {'Content-Type': 'application/json'}
+        if idempotency_key is not None:
+            headers['Idempotency-Key'] = idempotency_key
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            wait = self.random() * self.backoff * 2 ** attempt
+            try:
+                status_code, response_headers, content = self._request(url, body, headers)
+            except _NotSent as e:
+                if last_attempt:
+                    raise TransportException(str(e.__cause__)) from e.__cause__
+            except (OSError, HTTPException) as e:
+                if last_attempt or idempotency_key is None:
+                    raise TransportException(str(e)) from e
+            else:
+                if status_code not in self.retry_statuses or last_attempt or idempotency_key is None:
+                    return {
+                        'status_code': status_code,
+                        'headers': response_headers,
+                        'response': json.loads(content) if content else None,
+                    }
+                wait = max(wait, retry_after(response_headers) or 0)
+            self.sleep(wait)
+
+
+# Seconds to wait from a response's Retry-After header (a number of seconds, or an HTTP date), or None without one.
+def retry_after(headers):
+    value = (headers or {}).get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+_default_transport = None
+_default_transport_lock = Lock()
+
+
+# Clients built without a transport share this one, and so share its connection pools.
+def default_transport():
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = PooledHttpTransport()
+        return _default_transport
@@ -1,3 +1,22 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
 
-# Create your views here.
+from testapp.notifiers import AsyncBestsellerNotifier
+
+
+def _is_staff(request):
+    return request.user.is_active and request.user.is_staff
+
+
+# Async view, so under testproject/asgi.py the whole run stays on the server's event loop.
+# It texts every best selling author, so only staff may start it, and CSRF protection applies as usual.
+# Every run sends through the shared default_async_client(), so requests don't each start (and leak) a thread pool.
+async def notify_best_sellers(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    # request.user is loaded lazily from the session, which is a synchronous query.
+    if not await sync_to_async(_is_staff)(request):
+        return HttpResponseForbidden()
+    results = await AsyncBestsellerNotifier().notify_current_best_sellers()
+    sent = sum(1 for result in results if result.success)
+    return JsonResponse({'sent': sent, 'failed': len(results) - sent})
@@ -70,6 +70,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'testproject.wsgi.application'
 
+# Reports the slowest tests. Pass --parallel auto to run them in parallel, one process per core each with its own
+# clone of the test database (needs tblib, see the runner for what can't run in parallel).
+TEST_RUNNER = 'testproject.test_runner.TimedParallelTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
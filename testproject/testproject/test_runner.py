@@ -0,0 +1,88 @@
+# Test runner for running the suite in parallel, with per-test timings.
+#
+# Django builds the test database once, then clones it for each worker process (on PostgreSQL with
+# CREATE DATABASE ... TEMPLATE) and hands each worker whole TestCase classes. This runner reports the
+# slowest tests at the end of the run, timed inside whichever process ran them, serially by default or in
+# parallel with --parallel (e.g. --parallel auto for one process per core).
+#
+# Running in parallel is opt-in: some tests here fail on purpose, and their tracebacks can only be sent back
+# from a worker process with tblib installed, and worker processes are daemons, which can't start the process
+# pools some tests (the process formatter executor's) need.
+from time import perf_counter
+from unittest import TextTestResult
+
+from django.test.runner import DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner
+
+
+class TimedRemoteTestResult(RemoteTestResult):
+
+    def startTest(self, test):
+        self._started_at = perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        # replayed on the parent process's result, along with the rest of the events.
+        self.events.append(('addTestDuration', self.test_index, perf_counter() - self._started_at))
+        super().stopTest(test)
+
+
+class TimedRemoteTestRunner(RemoteTestRunner):
+    resultclass = TimedRemoteTestResult
+
+
+class TimedParallelTestSuite(ParallelTestSuite):
+    runner_class = TimedRemoteTestRunner
+
+
+class TimedTextTestResult(TextTestResult):
+    slowest = 10
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = []
+        self._remote_duration = None
+
+    def startTest(self, test):
+        self._started_at = perf_counter()
+        super().startTest(test)
+
+    def addTestDuration(self, test, duration):
+        self._remote_duration = duration
+
+    def stopTest(self, test):
+        duration = self._remote_duration
+        if duration is None:
+            duration = perf_counter() - self._started_at
+        self.durations.append((duration, test.id()))
+        self._remote_duration = None
+        super().stopTest(test)
+
+    def printErrors(self):
+        super().printErrors()
+        if self.slowest and self.durations:
+            self.stream.writeln(f'\nSlowest {min(self.slowest, len(self.durations))} tests:')
+            for duration, test_id in sorted(self.durations, reverse=True)[:self.slowest]:
+                self.stream.writeln(f'{duration:8.3f}s {test_id}')
+
+
+class TimedParallelTestRunner(DiscoverRunner):
+    parallel_test_suite = TimedParallelTestSuite
+
+    def __init__(self, slowest=10, **kwargs):
+        super().__init__(**kwargs)
+        self.slowest = slowest
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--slowest', type=int, default=10, metavar='N',
+            help='Report the N slowest tests at the end of the run, 0 to turn it off.',
+        )
+
+    def get_resultclass(self):
+        resultclass = super().get_resultclass() or TimedTextTestResult
+        if not issubclass(resultclass, TimedTextTestResult):
+            # --debug-sql and --pdb bring their own result classes.
+            return resultclass
+        return type(resultclass.__name__, (resultclass,), {'slowest': self.slowest})
@@ -16,6 +16,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from testapp import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('notifications/best-sellers/', views.notify_best_sellers),
 ]